@@ -50,6 +50,8 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
     static Socket socket;
 	static BufferedReader stdIn;
 	static PrintWriter out;
+	// Whether the server accepted the noack option, i.e. notifications get no reply.
+	static boolean noAck = false;
 
     private static void notifyOfError() {
         Scanner myInput = new Scanner( System.in );
@@ -71,6 +73,20 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
             socket = new Socket("localhost",41869);
             stdIn = new BufferedReader(new InputStreamReader(socket.getInputStream()));
         	out = new PrintWriter(socket.getOutputStream(), true);
+            // Ask the server not to acknowledge startGame and report* notifications.
+            out.write("hello noack\n");
+            out.flush();
+            String in = stdIn.readLine();
+            noAck = in != null && in.contains("noack");
+            // Wait until the server has warmed up, so the first game is not slowed down.
+            while (in != null && in.startsWith("hello")) {
+                out.write("ready\n");
+                out.flush();
+                String ready = stdIn.readLine();
+                if (ready == null || ready.equals("true"))
+                    break;
+                Thread.sleep(100);
+            }
         } catch (UnknownHostException e1) {
             notifyOfError();
             e1.printStackTrace();
@@ -116,10 +132,12 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
 			dataStr += " " + cards[i].toString();
 		}
 		try {
-			out.write(dataStr);
+			out.write(dataStr + "\n");
 			out.flush();
-			String in = stdIn.readLine();
-            if (verbose) { System.out.println(in); }
+			if (!noAck) {
+				String in = stdIn.readLine();
+				if (verbose) { System.out.println(in); }
+			}
 		} catch (Exception e) {
 			notifyOfError();
 		}
@@ -131,7 +149,7 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
 		String dataStr = "willDrawFaceUpCard " + card.toString();
 
 		try {
-			out.write(dataStr);
+			out.write(dataStr + "\n");
 			out.flush();
 			String in = stdIn.readLine();
 			boolean b = Boolean.parseBoolean(in);
@@ -151,10 +169,12 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
 		String dataStr = "reportDraw " + playerNum + " " + drawnCard.toString();
 
 		try {
-			out.write(dataStr);
+			out.write(dataStr + "\n");
 			out.flush();
-			String in = stdIn.readLine();
-			if (verbose) { System.out.println(in); }
+			if (!noAck) {
+				String in = stdIn.readLine();
+				if (verbose) { System.out.println(in); }
+			}
 		} catch (Exception e) {
 			notifyOfError();
 		}
@@ -166,7 +186,7 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
 		String dataStr = "getDiscard";
 
 		try {
-			out.write(dataStr);
+			out.write(dataStr + "\n");
 			out.flush();
 			String in = stdIn.readLine();
 			if (verbose) { System.out.println(in); }
@@ -182,10 +202,12 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
 		String dataStr = "reportDiscard " + playerNum + " " + discardedCard.toString();
 
 		try {
-			out.write(dataStr);
+			out.write(dataStr + "\n");
 			out.flush();
-			String in = stdIn.readLine();
-			if (verbose) { System.out.println(in); }
+			if (!noAck) {
+				String in = stdIn.readLine();
+				if (verbose) { System.out.println(in); }
+			}
 		} catch (Exception e) {
 			notifyOfError();
 		}
@@ -196,7 +218,7 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
 		String dataStr = "getFinalMelds";
 		ArrayList<ArrayList<Card>> meldList = new ArrayList<ArrayList<Card>>();
 		try {
-			out.write(dataStr);
+			out.write(dataStr + "\n");
 			out.flush();
 			String in = stdIn.readLine();
 			if (in.equals("null")) {
@@ -224,10 +246,12 @@ public class PrincetonGinPlayer implements ginrummy.GinRummyPlayer {
 	public void reportFinalMelds(int playerNum, ArrayList<ArrayList<Card>> melds) {
 		String dataStr = "reportFinalMelds " + playerNum; // melds isn't used for anything
 		try {
-			out.write(dataStr);
+			out.write(dataStr + "\n");
 			out.flush();
-			String in = stdIn.readLine();
-			if (verbose) { System.out.println(in); }
+			if (!noAck) {
+				String in = stdIn.readLine();
+				if (verbose) { System.out.println(in); }
+			}
 		} catch (Exception e) {
 			notifyOfError();
 		}
@@ -0,0 +1,208 @@
+# -------------------------------------------------------------------------------
+#  BinaryProtocol
+#  Compact binary framing of the SocketPlayer commands, negotiated with
+#  "hello binary" over the text protocol (see ServerSession).  Every byte after
+#  the newline of that hello line is binary.
+#
+#  A request is a one-byte opcode followed by fixed one-byte operands.  Cards are
+#  sent as their id number (0 - 51), with 255 for an unknown card.
+#
+#    opcode  command              operands                         reply
+#    1       startGame            playerNum startingPlayerNum n    ack
+#                                 followed by n cards
+#    2       willDrawFaceUpCard   card                             0 or 1
+#    3       reportDraw           playerNum card                   ack
+#    4       getDiscard                                            card
+#    5       reportDiscard        playerNum card                   ack
+#    6       getFinalMelds                                         melds
+#    7       reportFinalMelds     playerNum                        ack
+#    8       sync                                                  4-byte big-endian count
+#    9       stats                                                 4-byte big-endian length
+#                                                                  followed by JSON text
+#    10      ping                                                  ack (even with noack)
+#    11      ready                                                 0 or 1
+#
+#  ack is a single 0 byte, omitted when noack was negotiated as well.  melds is
+#  255 for null, otherwise the number of melds followed, for each meld, by its
+#  length and its cards.  A failed request of a multiplexed game is answered by
+#  the single byte ERROR (254) instead (see ServerSession).
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import struct
+
+from Deck import Deck
+
+class BinaryProtocol:
+
+    # Opcodes.
+    START_GAME = 1
+    WILL_DRAW_FACE_UP_CARD = 2
+    REPORT_DRAW = 3
+    GET_DISCARD = 4
+    REPORT_DISCARD = 5
+    GET_FINAL_MELDS = 6
+    REPORT_FINAL_MELDS = 7
+    SYNC = 8
+    STATS = 9
+    PING = 10
+    READY = 11
+
+    # Card byte of an unknown card, and melds byte of null melds.
+    NONE = 255
+
+    # Reply to a failed request of a multiplexed game.
+    ERROR = bytes([254])
+
+    # Map from opcode to command name.
+    COMMAND_NAMES = {
+        START_GAME: "startGame",
+        WILL_DRAW_FACE_UP_CARD: "willDrawFaceUpCard",
+        REPORT_DRAW: "reportDraw",
+        GET_DISCARD: "getDiscard",
+        REPORT_DISCARD: "reportDiscard",
+        GET_FINAL_MELDS: "getFinalMelds",
+        REPORT_FINAL_MELDS: "reportFinalMelds",
+        SYNC: "sync",
+        STATS: "stats",
+        PING: "ping",
+        READY: "ready",
+    }
+
+    # Map from opcode to the number of fixed operand bytes.
+    OPERAND_LENGTHS = {
+        START_GAME: 3,
+        WILL_DRAW_FACE_UP_CARD: 1,
+        REPORT_DRAW: 2,
+        GET_DISCARD: 0,
+        REPORT_DISCARD: 2,
+        GET_FINAL_MELDS: 0,
+        REPORT_FINAL_MELDS: 1,
+        SYNC: 0,
+        STATS: 0,
+        PING: 0,
+        READY: 0,
+    }
+
+    # Pre-encoded replies.
+    ACK = b"\x00"
+    FALSE = b"\x00"
+    TRUE = b"\x01"
+    NULL_MELDS = bytes([NONE])
+    CARD_BYTES = [bytes([i]) for i in range(Deck.NUM_CARDS)]
+
+    # Return the card with the given id byte, or None for NONE.
+    # @param cardId card id byte
+    # @return corresponding Card object or None
+    def toCard(cardId):
+        return None if cardId == BinaryProtocol.NONE else Deck.allCards[cardId]
+
+    # Split the next complete request off the front of a buffer.
+    # @param buffer bytes received so far
+    # @return (opcode, operand bytes, bytes consumed), or None if the request is incomplete
+    def parse(buffer):
+        if len(buffer) == 0:
+            return None
+        opcode = buffer[0]
+        length = BinaryProtocol.OPERAND_LENGTHS.get(opcode)
+        if length is None:
+            raise ValueError("unknown binary opcode %d" % opcode)
+        if len(buffer) < 1 + length:
+            return None
+        if opcode == BinaryProtocol.START_GAME:
+            length += buffer[3]
+            if len(buffer) < 1 + length:
+                return None
+        return opcode, buffer[1:1 + length], 1 + length
+
+    # Encode final melds.
+    # @param melds list of lists of cards, or None
+    # @return encoded melds
+    def encodeMelds(melds):
+        if melds is None:
+            return BinaryProtocol.NULL_MELDS
+        encoded = bytearray([len(melds)])
+        for meld in melds:
+            encoded.append(len(meld))
+            encoded.extend(card.getId() for card in meld)
+        return bytes(encoded)
+
+    # Requests about the whole connection rather than a game.
+    CONNECTION_OPCODES = [SYNC, STATS, PING, READY]
+
+    # Execute one request on a player.  CONNECTION_OPCODES are handled by the caller.
+    # @param player GinRummyPlayer executing the request
+    # @param opcode request opcode
+    # @param operands request operand bytes
+    # @return reply bytes (ACK for notifications)
+    def execute(player, opcode, operands):
+        return BinaryProtocol.HANDLERS[opcode](player, operands)
+
+    def _startGame(player, operands):
+        cards = [Deck.allCards[cardId] for cardId in operands[3:]]
+        player.startGame(operands[0], operands[1], cards)
+        return BinaryProtocol.ACK
+
+    def _willDrawFaceUpCard(player, operands):
+        return BinaryProtocol.TRUE if player.willDrawFaceUpCard(Deck.allCards[operands[0]]) else BinaryProtocol.FALSE
+
+    def _reportDraw(player, operands):
+        player.reportDraw(operands[0], BinaryProtocol.toCard(operands[1]))
+        return BinaryProtocol.ACK
+
+    def _getDiscard(player, operands):
+        return BinaryProtocol.CARD_BYTES[player.getDiscard().getId()]
+
+    def _reportDiscard(player, operands):
+        player.reportDiscard(operands[0], Deck.allCards[operands[1]])
+        return BinaryProtocol.ACK
+
+    def _getFinalMelds(player, operands):
+        return BinaryProtocol.encodeMelds(player.getFinalMelds())
+
+    def _reportFinalMelds(player, operands):
+        player.reportFinalMelds(operands[0], None)
+        return BinaryProtocol.ACK
+
+    # Map from opcode to the function executing it.
+    HANDLERS = {
+        START_GAME: _startGame,
+        WILL_DRAW_FACE_UP_CARD: _willDrawFaceUpCard,
+        REPORT_DRAW: _reportDraw,
+        GET_DISCARD: _getDiscard,
+        REPORT_DISCARD: _reportDiscard,
+        GET_FINAL_MELDS: _getFinalMelds,
+        REPORT_FINAL_MELDS: _reportFinalMelds,
+    }
+
+    # Encode the reply to sync.
+    # @param count number of notifications acknowledged
+    # @return reply bytes
+    def encodeCount(count):
+        return struct.pack(">I", count)
+
+    # Encode a text reply (e.g. to stats).
+    # @param text reply text
+    # @return reply bytes
+    def encodeText(text):
+        data = bytes(text, "ascii")
+        return struct.pack(">I", len(data)) + data
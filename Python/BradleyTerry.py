@@ -0,0 +1,138 @@
+# -------------------------------------------------------------------------------
+#  BradleyTerry
+#  Bradley-Terry ratings of agents from pairwise win counts, with confidence
+#  intervals, updated as match results come in.
+#
+#  Agent i beats agent j with probability 1 / (1 + exp(theta_j - theta_i)).
+#  The strengths theta are the maximum a posteriori estimate under a weak
+#  normal prior, which keeps them finite for agents that won or lost every
+#  game so far.  Every record refits them with a few Newton steps from the
+#  previous estimate, so the fit stays cheap as results accumulate.  The
+#  inverse of the Hessian is the covariance of the estimate; it gives the
+#  intervals and tells which pairing would shrink them most (pairScores).
+#
+#  Ratings are reported on the Elo scale (400 points per factor 10 of odds).
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import math
+
+import numpy as np
+
+class BradleyTerry:
+
+    # Elo points per unit of theta.
+    ELO_SCALE = 400 / math.log(10)
+
+    # @param names agent names
+    # @param priorSigma standard deviation of the prior on each theta
+    def __init__(self, names, priorSigma=2.0):
+        self.names = list(names)
+        n = len(self.names)
+        self.priorPrecision = 1 / priorSigma ** 2
+        # wins[i, j] is the number of games agent i won against agent j.
+        self.wins = np.zeros((n, n))
+        self.theta = np.zeros(n)
+        self.covariance = np.eye(n) * priorSigma ** 2
+
+    # Return the win probability of every agent against every other.
+    # @param theta strengths
+    # @return matrix of probabilities that agent i beats agent j
+    def _winProbabilities(theta):
+        return 1 / (1 + np.exp(theta[None, :] - theta[:, None]))
+
+    # Add match results and refit the ratings.
+    # @param i index of one agent
+    # @param j index of the other agent
+    # @param winsI games agent i won
+    # @param games games played
+    def record(self, i, j, winsI, games):
+        self.wins[i, j] += winsI
+        self.wins[j, i] += games - winsI
+        self.fit()
+
+    # Refit theta by Newton's method, starting from the current estimate.
+    # @param maxSteps Newton steps at most
+    # @param tolerance largest theta change at which to stop
+    def fit(self, maxSteps=50, tolerance=1e-9):
+        n = len(self.names)
+        games = self.wins + self.wins.T
+        for _ in range(maxSteps):
+            p = BradleyTerry._winProbabilities(self.theta)
+            gradient = (self.wins - games * p).sum(axis=1) - self.priorPrecision * self.theta
+            information = games * p * (1 - p)
+            # Negative Hessian: the Laplacian of the information weights plus the prior.
+            hessian = np.diag(information.sum(axis=1)) - information + self.priorPrecision * np.eye(n)
+            step = np.linalg.solve(hessian, gradient)
+            self.theta += step
+            if np.abs(step).max() < tolerance:
+                break
+        p = BradleyTerry._winProbabilities(self.theta)
+        information = games * p * (1 - p)
+        self.covariance = np.linalg.inv(np.diag(information.sum(axis=1)) - information + self.priorPrecision * np.eye(n))
+
+    # Return the ratings, centered on the mean agent, with confidence intervals.
+    # @param z normal quantile of the interval (1.96 for 95%)
+    # @return list parallel to names of (Elo rating, half width of its interval, games played)
+    def ratings(self, z=1.96):
+        n = len(self.names)
+        # Variance of theta_i - mean(theta).
+        centering = np.eye(n) - 1 / n
+        variances = np.diag(centering @ self.covariance @ centering)
+        elo = (self.theta - self.theta.mean()) * BradleyTerry.ELO_SCALE
+        halfWidths = z * np.sqrt(variances) * BradleyTerry.ELO_SCALE
+        games = (self.wins + self.wins.T).sum(axis=1)
+        return [(elo[i], halfWidths[i], int(games[i])) for i in range(n)]
+
+    # Return how informative one more game of each pairing would be: the variance
+    # of the estimated strength difference times the information a game carries.
+    # Close pairings whose difference is still uncertain score highest.
+    # @param covariance covariance of theta to use (the current one if None)
+    # @return matrix of scores (zero on the diagonal)
+    def pairScores(self, covariance=None):
+        covariance = self.covariance if covariance is None else covariance
+        p = BradleyTerry._winProbabilities(self.theta)
+        variance = np.diag(covariance)
+        differenceVariance = variance[:, None] + variance[None, :] - 2 * covariance
+        return differenceVariance * p * (1 - p)
+
+    # Choose the pairings to play next, greedily: after each choice the covariance
+    # is updated as if its games had been played, so the batch spreads over pairings.
+    # @param numPairings pairings to choose
+    # @param games games each pairing will play
+    # @return list of (i, j) with i < j, possibly repeating a pairing
+    def nextPairings(self, numPairings, games):
+        n = len(self.names)
+        covariance = self.covariance.copy()
+        p = BradleyTerry._winProbabilities(self.theta)
+        pairings = []
+        for _ in range(numPairings):
+            scores = np.triu(self.pairScores(covariance), 1)
+            i, j = np.unravel_index(np.argmax(scores), scores.shape)
+            pairings.append((int(i), int(j)))
+            # Rank one update of the information by the games of this pairing.
+            d = np.zeros(n)
+            d[i], d[j] = 1, -1
+            information = games * p[i, j] * (1 - p[i, j])
+            covarianceD = covariance @ d
+            covariance -= np.outer(covarianceD, covarianceD) * information / (1 + information * d @ covarianceD)
+        return pairings
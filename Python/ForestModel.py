@@ -0,0 +1,196 @@
+# -------------------------------------------------------------------------------
+#  ForestModel
+#  A flattened, read-only representation of the random forrest classifier used by
+#  OpponentHandEstimationPlayer.
+#
+#  The dill-pickled scikit-learn forest (rf2.obj) is slow to unpickle and every
+#  process holds its own private copy of it.  A ForestModel stores the same
+#  forest as a handful of flat arrays inside a directory (rf2.model by default):
+#
+#    rf2.model/meta.json      format name, format version and forest dimensions
+#    rf2.model/left.npy       left child of each node (leaves point at themselves)
+#    rf2.model/right.npy      right child of each node (leaves point at themselves)
+#    rf2.model/feature.npy    feature tested at each node
+#    rf2.model/threshold.npy  threshold tested at each node (+inf at leaves)
+#    rf2.model/leafProb.npy   probability of class 1 for every output at each node
+#    rf2.model/roots.npy      index of the root node of each tree
+#
+#  The .npy files are opened with mmap_mode='r', so loading only maps the files
+#  (milliseconds) and forked workers share the same physical pages.
+#
+#  Convert an existing pickle with:
+#
+#    $ python3 ForestModel.py rf2.obj rf2.model
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import json
+import os
+import sys
+
+import numpy as np
+
+class ForestModel:
+
+    # Name and version written to meta.json.  Bump FORMAT_VERSION whenever the
+    # layout of the arrays changes.
+    FORMAT_NAME = "flat-forest"
+    FORMAT_VERSION = 1
+
+    # Arrays making up a model directory.
+    ARRAY_NAMES = ["left", "right", "feature", "threshold", "leafProb", "roots"]
+
+    # Create a model from its flat arrays.  Prefer load or fromClassifier.
+    # @param arrays map from each of ARRAY_NAMES to its array
+    # @param maxDepth number of steps needed to reach a leaf from any root
+    def __init__(self, arrays, maxDepth):
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.leafProb = arrays["leafProb"]
+        self.roots = arrays["roots"]
+        self.maxDepth = maxDepth
+        self.numTrees = len(self.roots)
+        self.numOutputs = self.leafProb.shape[1]
+
+    # Flatten a fitted scikit-learn RandomForestClassifier (one binary output per card).
+    # @param rf fitted forest
+    # @return corresponding ForestModel
+    def fromClassifier(rf):
+        numOutputs = rf.n_outputs_
+        classesList = rf.classes_ if numOutputs > 1 else [rf.classes_]
+        left, right, feature, threshold, leafProb, roots = [], [], [], [], [], []
+        offset = 0
+        maxDepth = 0
+        for estimator in rf.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            isLeaf = tree.children_left == -1
+            nodes = np.arange(n)
+            left.append(np.where(isLeaf, nodes, tree.children_left) + offset)
+            right.append(np.where(isLeaf, nodes, tree.children_right) + offset)
+            feature.append(np.where(isLeaf, 0, tree.feature))
+            threshold.append(np.where(isLeaf, np.inf, tree.threshold))
+
+            # Per-tree class probabilities are the normalized node values.
+            value = tree.value.reshape(n, numOutputs, -1)
+            probs = np.zeros((n, numOutputs))
+            for k in range(numOutputs):
+                classes = list(classesList[k])
+                if 1 in classes:
+                    total = value[:, k, :].sum(axis=1)
+                    probs[:, k] = value[:, k, classes.index(1)] / np.where(total == 0, 1, total)
+            leafProb.append(probs)
+
+            roots.append(offset)
+            offset += n
+            maxDepth = max(maxDepth, tree.max_depth)
+
+        arrays = {
+            "left": np.concatenate(left).astype(np.int32),
+            "right": np.concatenate(right).astype(np.int32),
+            "feature": np.concatenate(feature).astype(np.int32),
+            "threshold": np.concatenate(threshold).astype(np.float64),
+            "leafProb": np.concatenate(leafProb).astype(np.float64),
+            "roots": np.array(roots, dtype=np.int32),
+        }
+        return ForestModel(arrays, maxDepth)
+
+    # Load a model directory written by save.  Arrays are memory-mapped read-only.
+    # @param path model directory
+    # @return corresponding ForestModel
+    def load(path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != ForestModel.FORMAT_NAME or meta.get("version") != ForestModel.FORMAT_VERSION:
+            raise ValueError("%s is not a %s model of version %d" % (path, ForestModel.FORMAT_NAME, ForestModel.FORMAT_VERSION))
+        arrays = {}
+        for name in ForestModel.ARRAY_NAMES:
+            arrays[name] = np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+        return ForestModel(arrays, meta["maxDepth"])
+
+    # Load a model from either a model directory or a legacy dill pickle (e.g. rf2.obj).
+    # @param path model directory or pickle file
+    # @return corresponding ForestModel
+    def loadAny(path):
+        if os.path.isdir(path):
+            return ForestModel.load(path)
+        import dill
+        with open(path, "rb") as f:
+            return ForestModel.fromClassifier(dill.load(f))
+
+    # Write this model to a directory that load can memory-map.
+    # @param path model directory (created if needed)
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ForestModel.ARRAY_NAMES:
+            np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(getattr(self, name)))
+        meta = {
+            "format": ForestModel.FORMAT_NAME,
+            "version": ForestModel.FORMAT_VERSION,
+            "maxDepth": int(self.maxDepth),
+            "numTrees": int(self.numTrees),
+            "numOutputs": int(self.numOutputs),
+            "numNodes": int(len(self.left)),
+        }
+        # meta.json is written last so a partially written directory never loads.
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    # Return the total size in bytes of the model arrays.
+    # @return total size in bytes of the model arrays
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ForestModel.ARRAY_NAMES)
+
+    # Return the probability of class 1 for every output, averaged over all trees.
+    # Equivalent to stacking the [:, 1] columns of RandomForestClassifier.predict_proba.
+    # @param X array of shape (numSamples, numFeatures)
+    # @return array of shape (numSamples, numOutputs)
+    def predictProba(self, X):
+        # scikit-learn compares float32 features against float64 thresholds.
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.numTrees))
+        for _ in range(self.maxDepth):
+            goLeft = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(goLeft, self.left[nodes], self.right[nodes])
+        return self.leafProb[nodes].mean(axis=1)
+
+# Convert a dill-pickled forest into a model directory and check that it agrees.
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python3 ForestModel.py rf2.obj rf2.model", file=sys.stderr)
+        exit(1)
+    import dill
+    import time
+    with open(sys.argv[1], "rb") as f:
+        rf = dill.load(f)
+    ForestModel.fromClassifier(rf).save(sys.argv[2])
+
+    startMs = time.time() * 1000
+    model = ForestModel.load(sys.argv[2])
+    print("Loaded %s in %.2f ms (%d trees, %d bytes)." % (sys.argv[2], time.time() * 1000 - startMs, model.numTrees, model.nbytes()))
+
+    X = (np.random.rand(100, rf.n_features_in_) < 0.1).astype(float)
+    expected = np.array(rf.predict_proba(X))[:, :, 1].T
+    print("Max difference from predict_proba: %g" % np.abs(model.predictProba(X) - expected).max())
@@ -29,12 +29,14 @@
 # 02111-1307, USA.
 #-------------------------------------------------------------------------------
 
+import argparse
 import random
 import time
 from Deck import Deck
 from GinRummyUtil import GinRummyUtil
 from SimpleGinRummyPlayer import SimpleGinRummyPlayer
 from OpponentHandEstimationPlayer import OpponentHandEstimationPlayer
+from SequentialTest import SequentialTest
 
 #-------------------------------------------------------------------------------
 # TRACKING
@@ -67,9 +69,6 @@ class GinRummyGame:
     # Whether or not to print information during game play
     playVerbose = False;
 
-    # Two Gin Rummy players numbered according to their array index.
-    players = [];
-
     # Set whether or not there is to be printed output during gameplay.
     # @param playVerbose whether or not there is to be printed output during gameplay
     def setPlayVerbose(playVerbose):
@@ -79,16 +78,24 @@ class GinRummyGame:
     # @param player0 Player 0
     # @param player1 Player 1
     def __init__(self, player0, player1):
-        GinRummyGame.players.extend([player0, player1])
+        # Two Gin Rummy players numbered according to their array index.
+        # Kept per game so that several games can run side by side.
+        self.players = [player0, player1]
+        # Scores after each hand of the last game played.
+        self.roundScores = []
 
     # Play a game of Gin Rummy and return the winning player number 0 or 1.
+    # @param seed seed of the starting player and the deals (the global random state if None).
+    #        The same seed deals the same cards to the same seats, whoever sits there.
     # @return the winning player number 0 or 1
-    def play(self):
+    def play(self, seed=None):
+        rng = random if seed is None else random.Random(seed)
         scores = [0, 0]
+        self.roundScores = []
         hands = []
         hands.extend([[], []])
 
-        startingPlayer = random.randrange(2);
+        startingPlayer = rng.randrange(2);
 
         # while game not over
         while scores[0] < GinRummyUtil.GOAL_SCORE and scores[1] < GinRummyUtil.GOAL_SCORE:
@@ -97,13 +104,13 @@ class GinRummyGame:
             opponent = (1 if currentPlayer == 0 else 0)
 
             # get shuffled deck and deal cards
-            deck = Deck.getShuffle(random.randrange(10 ** 8))
+            deck = Deck.getShuffle(rng.randrange(10 ** 8))
             hands[0] = []
             hands[1] = []
             for i in range(2 * GinRummyGame.HAND_SIZE):
                 hands[i % 2] += [deck.pop()]
             for i in range(2):
-                GinRummyGame.players[i].startGame(i, startingPlayer, hands[i]);
+                self.players[i].startGame(i, startingPlayer, hands[i]);
                 if GinRummyGame.playVerbose:
                     print("Player %d is dealt %s.\n" % (i, hands[i]))
             if GinRummyGame.playVerbose:
@@ -128,7 +135,7 @@ class GinRummyGame:
                 # offer draw face-up iff not 3rd turn with first face up card (decline automatically in that case)
                 if not (turnsTaken == 2 and faceUpCard == firstFaceUpCard):
                     # both players declined and 1st player must draw face down
-                    drawFaceUp = GinRummyGame.players[currentPlayer].willDrawFaceUpCard(faceUpCard)
+                    drawFaceUp = self.players[currentPlayer].willDrawFaceUpCard(faceUpCard)
                     if GinRummyGame.playVerbose and not drawFaceUp and faceUpCard == firstFaceUpCard and turnsTaken < 2:
                         print("Player %d declines %s.\n" % (currentPlayer, firstFaceUpCard))
 
@@ -137,7 +144,7 @@ class GinRummyGame:
                     drawCard = discards.pop() if drawFaceUp else deck.pop()
                     for i in range(2):
                         to_report = drawCard if i == currentPlayer or drawFaceUp else None
-                        GinRummyGame.players[i].reportDraw(currentPlayer, to_report)
+                        self.players[i].reportDraw(currentPlayer, to_report)
                         # TRACKING
                         # if i != currentPlayer: # player i is tracking currentPlayer
                         #     if drawFaceUp:
@@ -149,23 +156,23 @@ class GinRummyGame:
                     hands[currentPlayer].append(drawCard)
 
                     # DISCARD
-                    discardCard = GinRummyGame.players[currentPlayer].getDiscard()
+                    discardCard = self.players[currentPlayer].getDiscard()
                     if not discardCard in hands[currentPlayer] or discardCard == faceUpCard:
                         print("Player %d discards %s illegally and forfeits.\n" % (currentPlayer, discardCard))
                         return opponent;
 
                     hands[currentPlayer].remove(discardCard)
                     for i in range(2):
-                        GinRummyGame.players[i].reportDiscard(currentPlayer, discardCard)
+                        self.players[i].reportDiscard(currentPlayer, discardCard)
                         # TRACKING
                         # if i != currentPlayer: # player i is tracking currentPlayer
                         #     tracking_pastdiscards[i][discardCard.getId()] = 1
                         #     tracking_pastpickups[i][discardCard.getId()] = 0
-                        #     tracking_hand = one_hot(GinRummyGame.players[currentPlayer].cards)
+                        #     tracking_hand = one_hot(self.players[currentPlayer].cards)
                         #     tracking_hand[discardCard.getId()] = 0
                         #     tracking_hands.append(tracking_hand)
                         #     tracking_states.append(np.array([tracking_pastdiscards[i], tracking_pastpickups[i], tracking_pastnonpickups[i]]))
-                        #     tracking_states2.append(np.array([tracking_pastdiscards[i], tracking_pastpickups[i], tracking_pastnonpickups[i], one_hot(GinRummyGame.players[i].cards)]))
+                        #     tracking_states2.append(np.array([tracking_pastdiscards[i], tracking_pastpickups[i], tracking_pastnonpickups[i], one_hot(self.players[i].cards)]))
                     if GinRummyGame.playVerbose:
                         print("Player %d discards %s.\n" % (currentPlayer, discardCard))
                     discards.append(discardCard)
@@ -183,7 +190,7 @@ class GinRummyGame:
                             print("Player %d has %s with %d deadwood.\n" % (currentPlayer, melds, GinRummyUtil.getDeadwoodPoints3(unmeldedCards)))
 
                     # CHECK FOR KNOCK
-                    knockMelds = GinRummyGame.players[currentPlayer].getFinalMelds()
+                    knockMelds = self.players[currentPlayer].getFinalMelds()
                     if knockMelds != None:
                         # player knocked; end of round
                         break
@@ -215,7 +222,7 @@ class GinRummyGame:
                 for meld in knockMelds:
                     meldsCopy.append(meld.copy())
                 for i in range(2):
-                    GinRummyGame.players[i].reportFinalMelds(currentPlayer, meldsCopy)
+                    self.players[i].reportFinalMelds(currentPlayer, meldsCopy)
                 if GinRummyGame.playVerbose:
                     if knockingDeadwood > 0:
                         print("Player %d melds %s with %d deadwood from %s.\n" % (currentPlayer, knockMelds, knockingDeadwood, GinRummyUtil.bitstringToCards(unmelded)))
@@ -223,12 +230,12 @@ class GinRummyGame:
                         print("Player %d goes gin with melds %s.\n" % (currentPlayer, knockMelds))
 
                 # get opponent meld
-                opponentMelds = GinRummyGame.players[opponent].getFinalMelds();
+                opponentMelds = self.players[opponent].getFinalMelds();
                 meldsCopy = []
                 for meld in opponentMelds:
                     meldsCopy.append(meld.copy())
                 for i in range(2):
-                    GinRummyGame.players[i].reportFinalMelds(opponent, meldsCopy)
+                    self.players[i].reportFinalMelds(opponent, meldsCopy)
 
                 # check legality of opponent meld
                 opponentHandBitstring = GinRummyUtil.cardsToBitstring(hands[opponent])
@@ -267,7 +274,7 @@ class GinRummyGame:
                                 if GinRummyGame.playVerbose:
                                     print("Player %d lays off %s on %s.\n" % (opponent, layOffCard, layOffMeld))
                                 for i in range(2):
-                                    GinRummyGame.players[i].reportLayoff(opponent, layOffCard, layOffMeld.copy())
+                                    self.players[i].reportLayoff(opponent, layOffCard, layOffMeld.copy())
                                 unmeldedCards.remove(layOffCard)
                                 layOffMeld.append(layOffCard)
                                 cardWasLaidOff = True
@@ -312,13 +319,14 @@ class GinRummyGame:
             # report final hands
             for i in range(2):
                 for j in range(2):
-                    GinRummyGame.players[i].reportFinalHand(j, hands[j].copy())
+                    self.players[i].reportFinalHand(j, hands[j].copy())
 
             # score reporting
             if GinRummyGame.playVerbose:
                 print("Player\tScore\n0\t%d\n1\t%d\n" % (scores[0], scores[1]))
             for i in range(2):
-                GinRummyGame.players[i].reportScores(scores.copy())
+                self.players[i].reportScores(scores.copy())
+            self.roundScores.append(scores.copy())
 
         if GinRummyGame.playVerbose:
             print("Player %s wins.\n" % (0 if scores[0] > scores[1] else 1))
@@ -327,6 +335,12 @@ class GinRummyGame:
 
 # Test and demonstrate the use of the GinRummyGame class.
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Play SimpleGinRummyPlayer against OpponentHandEstimationPlayer.')
+    parser.add_argument('--games', type=int, default=1000, help='games to play (at most, with --sequential)')
+    parser.add_argument('--sequential', action='store_true', help='stop as soon as the stronger player is known (see SequentialTest)')
+    parser.add_argument('--delta', type=float, default=0.05, help='win rate distance from 1/2 to detect (with --sequential)')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='chance of naming the wrong player (with --sequential)')
+    args = parser.parse_args()
 
     # Single verbose demonstration game
     GinRummyGame.setPlayVerbose(True)
@@ -334,14 +348,19 @@ if __name__ == "__main__":
 
     # Multiple non-verbose games
     GinRummyGame.setPlayVerbose(False)
-    numGames = 1000
+    numGames = args.games
+    test = SequentialTest(args.delta, args.error_rate) if args.sequential else None
     numP1Wins = 0
     game = GinRummyGame(SimpleGinRummyPlayer(), OpponentHandEstimationPlayer())
     startMs = int(round(time.time() * 1000))
-    for i in range(numGames):
+    for i in range(args.games):
         if i % 500 == 0:
             print("Game ... ", i)
-        numP1Wins += game.play()
+        win = game.play()
+        numP1Wins += win
+        if test is not None and test.update(win) is not None:
+            numGames = i + 1
+            break
 
     # TRACKING
     # np.save('states.npy', tracking_states)
@@ -351,3 +370,10 @@ if __name__ == "__main__":
     totalMs = int(round(time.time() * 1000)) - startMs
     print("%d games played in %d ms.\n" % (numGames, totalMs))
     print("Games Won: P0:%d, P1:%d.\n" % (numGames - numP1Wins, numP1Wins))
+    if test is not None:
+        decision = test.decision()
+        if decision is None:
+            print("Undecided after %d games: the win rate is within %.2f of 1/2 or needs more games." % (numGames, args.delta))
+        else:
+            print("P%d is stronger (error rate %.2f at win rate 1/2 +- %.2f); %d of %d games saved." % (decision,
+                args.error_rate, args.delta, args.games - numGames, args.games))
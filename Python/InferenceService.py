@@ -0,0 +1,185 @@
+# -------------------------------------------------------------------------------
+#  InferenceService
+#  Micro-batches opponent hand predictions from many concurrently running
+#  OpponentHandEstimationPlayers into single vectorized forest evaluations.
+#
+#  Players submit their model and 156-long state vector and block until the
+#  result is ready.  A background thread waits for the first request, keeps
+#  collecting requests until either maxBatchSize requests are queued or
+#  maxLatency seconds have passed since the first one arrived, and then
+#  evaluates the requests of each model with one ForestModel.predictProba call.
+#  Each player passes its own model, so a reloaded model (see
+#  ModelRegistry.reload) is used from the player's next game on as without
+#  the service.
+#
+#  This is a library piece for hosts that run games in several threads of one
+#  process; nothing in this directory attaches it.  Server.py runs all sessions
+#  of a process one after the other on a single thread (with --workers, one
+#  process per worker), so a blocking predict there could never meet a second
+#  request and would only add maxLatency to every decision.
+#
+#  service = InferenceService(maxBatchSize=32, maxLatency=0.002)
+#  service.start()
+#  player.setInferenceService(service)
+#
+#  Running this file checks batched against direct evaluation.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+class InferenceService:
+
+    # Create a service.
+    # @param maxBatchSize largest number of states evaluated together
+    # @param maxLatency longest time in seconds the first request of a batch waits for more
+    def __init__(self, maxBatchSize=32, maxLatency=0.002):
+        self.maxBatchSize = maxBatchSize
+        self.maxLatency = maxLatency
+        self.requests = queue.Queue()
+        self.thread = None
+        self.running = False
+        # Guards running, so that no request is queued behind the stop sentinel.
+        self.lock = threading.Lock()
+
+        # Statistics
+        self.numBatches = 0
+        self.numRequests = 0
+
+    # Start the background batching thread.
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name="InferenceService", daemon=True)
+            self.thread.start()
+
+    # Stop the background batching thread after the requests already queued.
+    # Later requests are evaluated directly by the submitting thread.
+    def stop(self):
+        with self.lock:
+            if self.thread is None:
+                return
+            self.running = False
+            self.requests.put(None)
+            thread = self.thread
+            self.thread = None
+        thread.join()
+
+    # Queue a state for evaluation.
+    # @param model ForestModel (or anything with predictProba) to evaluate the state with
+    # @param state state vector (copied, so the caller may keep mutating it)
+    # @return Future resolving to the probability of each output
+    def submit(self, model, state):
+        future = Future()
+        with self.lock:
+            if self.running:
+                self.requests.put((model, np.array(state, dtype=np.float32), future))
+                return future
+        future.set_result(model.predictProba(np.array(state)[np.newaxis])[0])
+        return future
+
+    # Evaluate a state, blocking until its batch has been evaluated.
+    # @param model ForestModel to evaluate the state with
+    # @param state state vector
+    # @return probability of each output
+    def predict(self, model, state):
+        return self.submit(model, state).result()
+
+    # Return the mean number of states evaluated per forest call.
+    # @return mean batch size
+    def meanBatchSize(self):
+        return self.numRequests / self.numBatches if self.numBatches > 0 else 0.0
+
+    def _run(self):
+        while True:
+            first = self.requests.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.maxLatency
+            stopping = False
+            while len(batch) < self.maxBatchSize:
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            # One forest call per model; players of different models do not mix.
+            byModel = {}
+            for request in batch:
+                byModel.setdefault(id(request[0]), []).append(request)
+            for requests in byModel.values():
+                self._evaluate(requests)
+            if stopping:
+                return
+
+    def _evaluate(self, batch):
+        try:
+            probs = batch[0][0].predictProba(np.stack([state for _, state, _ in batch]))
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.numBatches += 1
+        self.numRequests += len(batch)
+        for i, (_, _, future) in enumerate(batch):
+            future.set_result(probs[i])
+
+# Check batched against single-row evaluation of the default model and time both.
+if __name__ == "__main__":
+    from ModelRegistry import ModelRegistry
+
+    model = ModelRegistry.get()
+    states = (np.random.rand(256, 156) < 0.1).astype(float)
+    service = InferenceService(maxBatchSize=64, maxLatency=0.005)
+    service.start()
+
+    startTime = time.perf_counter()
+    expected = [model.predictProba(state[np.newaxis])[0] for state in states]
+    print("Single-row: %.3f ms per state" % ((time.perf_counter() - startTime) * 1000 / len(states)))
+
+    results = [None] * len(states)
+    def predictState(i):
+        results[i] = service.predict(model, states[i])
+    startTime = time.perf_counter()
+    threads = [threading.Thread(target=predictState, args=(i,)) for i in range(len(states))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print("Batched: %.3f ms per state, mean batch size %.1f" % ((time.perf_counter() - startTime) * 1000 / len(states), service.meanBatchSize()))
+    print("Max difference from single-row: %g" % max(np.abs(result - e).max() for result, e in zip(results, expected)))
+
+    # Requests after stop are evaluated directly instead of waiting forever.
+    service.stop()
+    print("After stop: max difference %g" % np.abs(service.predict(model, states[0]) - expected[0]).max())
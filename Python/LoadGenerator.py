@@ -0,0 +1,144 @@
+# -------------------------------------------------------------------------------
+#  LoadGenerator
+#  Stresses a running Server.py with many concurrent games, without a JVM.
+#
+#  Every simulated game is a GinRummyGame between a SimpleGinRummyPlayer and the
+#  served player, reached through its own ProtocolClient connection, so the
+#  server sees exactly the command sequence of PrincetonGinPlayer under the
+#  Python game rules.  The games are spread over client processes (so the client
+#  side does not share one interpreter lock) and threads within each process.
+#  The report gives throughput and the latency percentiles of each decision.
+#
+#    $ python3 Server.py --workers 4 &
+#    $ python3 LoadGenerator.py --games 64 --processes 4 --duration 30
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import argparse
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from GinRummyGame import GinRummyGame
+from GinRummyPlayer import GinRummyPlayer
+from ProtocolClient import ProtocolClient
+from SimpleGinRummyPlayer import SimpleGinRummyPlayer
+
+# Decisions whose latency is reported.
+DECISIONS = ["willDrawFaceUpCard", "getDiscard", "getFinalMelds"]
+
+# GinRummyPlayer forwarding the callbacks PrincetonGinPlayer forwards.
+class LoadPlayer(GinRummyPlayer):
+
+    # @param client ProtocolClient connected to the server
+    def __init__(self, client):
+        self.client = client
+
+    def startGame(self, playerNum, startingPlayerNum, cards):
+        self.client.startGame(playerNum, startingPlayerNum, cards)
+
+    def willDrawFaceUpCard(self, card):
+        return self.client.willDrawFaceUpCard(card)
+
+    def reportDraw(self, playerNum, drawnCard):
+        self.client.reportDraw(playerNum, drawnCard)
+
+    def getDiscard(self):
+        return self.client.getDiscard()
+
+    def reportDiscard(self, playerNum, discardedCard):
+        self.client.reportDiscard(playerNum, discardedCard)
+
+    def getFinalMelds(self):
+        return self.client.getFinalMelds()
+
+    def reportFinalMelds(self, playerNum, melds):
+        self.client.reportFinalMelds(playerNum)
+
+# Play games on one connection until the deadline or until maxMatches are played.
+# @param args parsed command line arguments
+# @param deadline time.time() at which to stop starting matches
+# @param results list to append (matches played, latencies by command) to
+def playMatches(args, deadline, results):
+    client = ProtocolClient(args.host, args.port, args.unix_path, not args.ack, binary=args.binary)
+    game = GinRummyGame(LoadPlayer(client), SimpleGinRummyPlayer())
+    matches = 0
+    try:
+        while time.time() < deadline and (args.matches is None or matches < args.matches):
+            game.play()
+            matches += 1
+    finally:
+        client.close()
+    results.append((matches, client.latencies))
+
+# Run a share of the games in threads of this process.
+# @param args parsed command line arguments
+# @param numGames number of concurrent games in this process
+# @return (matches played, map from command to array of latencies in seconds)
+def runClient(args, numGames):
+    deadline = time.time() + args.duration
+    results = []
+    threads = [threading.Thread(target=playMatches, args=(args, deadline, results)) for _ in range(numGames)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    matches = sum(result[0] for result in results)
+    latencies = {command: np.array([t for result in results for t in result[1].get(command, [])]) for command in DECISIONS}
+    return matches, latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test a running Server.py with concurrent games.')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=41869)
+    parser.add_argument('--unix-path', default=None, help='connect to this unix domain socket instead of host and port')
+    parser.add_argument('--games', type=int, default=16, help='games played concurrently, one connection each')
+    parser.add_argument('--processes', type=int, default=1, help='client processes the games are spread over')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds after which no new matches are started')
+    parser.add_argument('--matches', type=int, default=None, help='matches (games to 100 points) per connection at most')
+    parser.add_argument('--ack', action='store_true', help='wait for the acknowledgement of every notification')
+    parser.add_argument('--binary', action='store_true', help='send the commands in the binary framing of BinaryProtocol')
+    args = parser.parse_args()
+
+    probe = ProtocolClient(args.host, args.port, args.unix_path)
+    if not probe.waitUntilReady():
+        raise SystemExit('Server did not become ready')
+    probe.close()
+
+    shares = [len(range(i, args.games, args.processes)) for i in range(args.processes)]
+    startTime = time.time()
+    with ProcessPoolExecutor(args.processes) as executor:
+        outcomes = list(executor.map(runClient, [args] * args.processes, shares))
+    seconds = time.time() - startTime
+
+    matches = sum(outcome[0] for outcome in outcomes)
+    print("%d matches on %d connections in %.1f s: %.2f matches/s" % (matches, args.games, seconds, matches / seconds))
+    print("%-20s %10s %10s %10s %10s %10s %10s" % ("command", "count", "per s", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for command in DECISIONS:
+        latencies = np.concatenate([outcome[1][command] for outcome in outcomes]) * 1000
+        if len(latencies) == 0:
+            continue
+        print("%-20s %10d %10.1f %10.3f %10.3f %10.3f %10.3f" % (command, len(latencies), len(latencies) / seconds,
+            np.percentile(latencies, 50), np.percentile(latencies, 95), np.percentile(latencies, 99), latencies.max()))
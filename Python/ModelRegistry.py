@@ -0,0 +1,171 @@
+# -------------------------------------------------------------------------------
+#  ModelRegistry
+#  Process-wide registry of loaded ForestModels.
+#
+#  Every OpponentHandEstimationPlayer asks the registry for its model instead of
+#  loading it, so a model artifact is loaded at most once per process and all
+#  players share the same read-only arrays.  Call preload before forking worker
+#  processes (multiprocessing with the "fork" start method) so that the workers
+#  inherit the already loaded model copy-on-write instead of loading their own.
+#
+#  reload loads the model directory MODEL_DIR afresh, checks it with a smoke
+#  prediction and makes it the active model, used by every player that does not
+#  ask for a particular model from its next game on.  Games in progress keep the
+#  model they started with, so a long running server can switch models without
+#  dropping matches.  reload never unpickles: a new pickle is converted offline
+#  with ForestModel.py and then copied over MODEL_DIR.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from ForestModel import ForestModel
+
+class ModelRegistry:
+
+    # Converted model directory, and the legacy pickle used when it is missing.
+    MODEL_DIR = "rf2.model"
+    MODEL_PICKLE = "rf2.obj"
+
+    # Map from absolute model path to loaded ForestModel.
+    models = {}
+
+    # Map from absolute model path to seconds spent loading it.
+    loadSeconds = {}
+
+    # Guards models and loadSeconds.
+    lock = threading.Lock()
+
+    # Absolute path of the active model set by reload (the default model if None).
+    activePath = None
+
+    # Error of the last failed reload, or None if it succeeded.
+    reloadError = None
+
+    # Input and output sizes a reloaded opponent hand model must have.
+    STATE_SIZE = 156
+    NUM_CARDS = 52
+
+    # Return the path of the default opponent hand estimation model.
+    # @return rf2.model if it exists, rf2.obj otherwise
+    def defaultPath():
+        return ModelRegistry.MODEL_DIR if os.path.isdir(ModelRegistry.MODEL_DIR) else ModelRegistry.MODEL_PICKLE
+
+    # Return the shared model for the given path, loading it on first use.
+    # @param path model directory or pickle (active model if None)
+    # @return shared, read-only ForestModel
+    def get(path=None):
+        if path is None:
+            path = ModelRegistry.activePath if ModelRegistry.activePath is not None else ModelRegistry.defaultPath()
+        key = os.path.abspath(path)
+        with ModelRegistry.lock:
+            model = ModelRegistry.models.get(key)
+            if model is None:
+                startTime = time.perf_counter()
+                model = ForestModel.loadAny(key)
+                ModelRegistry.loadSeconds[key] = time.perf_counter() - startTime
+                ModelRegistry.models[key] = model
+            return model
+
+    # Load the given models now, e.g. before forking worker processes.
+    # @param paths model paths (just the default model if None)
+    def preload(paths=None):
+        for path in (paths if paths is not None else [None]):
+            ModelRegistry.get(path)
+
+    # Load the model directory afresh, check it with a smoke prediction and make it
+    # the active model.  The previous active model stays with the players holding it.
+    # @return the new active ForestModel (raises ValueError if the directory is unusable)
+    def reload():
+        key = os.path.abspath(ModelRegistry.MODEL_DIR)
+        try:
+            startTime = time.perf_counter()
+            # Only a converted directory, never a pickle (see ForestModel.py).
+            model = ForestModel.load(key)
+            seconds = time.perf_counter() - startTime
+            probs = model.predictProba(np.zeros((1, ModelRegistry.STATE_SIZE)))
+            if probs.shape != (1, ModelRegistry.NUM_CARDS):
+                raise ValueError("smoke prediction has shape %s instead of %s" % (probs.shape, (1, ModelRegistry.NUM_CARDS)))
+            if not np.all((probs >= 0) & (probs <= 1)):
+                raise ValueError("smoke prediction is not a probability")
+        except Exception as e:
+            ModelRegistry.reloadError = "%s: %s" % (key, e)
+            raise ValueError("cannot reload %s: %s" % (key, e))
+
+        with ModelRegistry.lock:
+            previous = os.path.abspath(ModelRegistry.activePath if ModelRegistry.activePath is not None else ModelRegistry.defaultPath())
+            if previous != key:
+                # Players still holding the previous model keep it alive until their game ends.
+                ModelRegistry.models.pop(previous, None)
+                ModelRegistry.loadSeconds.pop(previous, None)
+            ModelRegistry.models[key] = model
+            ModelRegistry.loadSeconds[key] = seconds
+            ModelRegistry.activePath = key
+            ModelRegistry.reloadError = None
+        return model
+
+    # Run reload in a background thread, printing the outcome.
+    # @return the started thread
+    def reloadInBackground():
+        def reloadModel():
+            try:
+                model = ModelRegistry.reload()
+                print('Reloaded model %s (%d trees)' % (ModelRegistry.activePath, model.numTrees))
+            except ValueError as e:
+                print('Keeping the current model: %s' % e)
+        thread = threading.Thread(target=reloadModel, name="ModelReload", daemon=True)
+        thread.start()
+        return thread
+
+    # Forget all loaded models.  Players keep the models they already hold.
+    def clear():
+        with ModelRegistry.lock:
+            ModelRegistry.models.clear()
+            ModelRegistry.loadSeconds.clear()
+
+    # Return the resident set size of this process in bytes, or None if unknown.
+    # @return resident set size of this process in bytes
+    def processResidentBytes():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return None
+
+    # Return load time and size for every loaded model, and the outcome of reloads.
+    # @return map with a "models" entry (path -> loadSeconds, nbytes, numTrees), "activePath",
+    #         "reloadError" and "processResidentBytes"
+    def stats():
+        with ModelRegistry.lock:
+            models = {}
+            for key, model in ModelRegistry.models.items():
+                models[key] = {
+                    "loadSeconds": ModelRegistry.loadSeconds[key],
+                    "nbytes": model.nbytes(),
+                    "numTrees": model.numTrees,
+                }
+        return {"models": models, "activePath": ModelRegistry.activePath, "reloadError": ModelRegistry.reloadError,
+            "processResidentBytes": ModelRegistry.processResidentBytes()}
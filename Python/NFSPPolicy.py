@@ -0,0 +1,161 @@
+# -------------------------------------------------------------------------------
+#  NFSPPolicy
+#  A pure NumPy forward pass of the NFSP average policy network trained with
+#  rlcard (see Old/NFSPPlayer.py), so the trained agent can play without
+#  TensorFlow or rlcard.
+#
+#  The network is: flatten the 4x52 observation -> batch normalization ->
+#  fully connected 128 units with tanh -> fully connected 110 action logits ->
+#  softmax.  Illegal actions are masked out and the remaining probabilities
+#  renormalized (uniform over legal actions if they all vanish), exactly as
+#  rlcard's remove_illegal does, and the action is sampled from the result.
+#
+#  Export the checkpoint once (this step, and only this step, needs TensorFlow):
+#
+#    $ python3 NFSPPolicy.py ../Old/gin_rummy_nfsp4 nfsp4.npz
+#
+#  NFSPAgent keeps the average policy network below its scope in "sl"
+#  (nfsp0/sl/batch_normalization/..., nfsp0/sl/fully_connected{,_1}/...); the
+#  q-networks next to it are not exported.  --scope selects another agent.
+#
+#  rlcard builds the batch normalization layer with training=True, so the
+#  restored graph normalizes with the statistics of the evaluated batch rather
+#  than the moving averages.  The export records this as bnMode "batch"; pass
+#  --moving-stats to export a policy normalizing with the moving averages.
+#  With batch statistics a single observation normalizes to beta whatever it
+#  is, so the policy played by NFSPPlayer (and by default here) does not depend
+#  on the observation.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import argparse
+
+import numpy as np
+
+class NFSPPolicy:
+
+    # Version of the exported .npz layout.
+    FORMAT_VERSION = 1
+
+    # Epsilon of tf.layers.batch_normalization.
+    BN_EPSILON = 1e-3
+
+    # Checkpoint variable suffixes (below the average policy scope) for each exported array.
+    CHECKPOINT_NAMES = {
+        "gamma": "batch_normalization/gamma",
+        "beta": "batch_normalization/beta",
+        "movingMean": "batch_normalization/moving_mean",
+        "movingVariance": "batch_normalization/moving_variance",
+        "hiddenWeights": "fully_connected/weights",
+        "hiddenBiases": "fully_connected/biases",
+        "outputWeights": "fully_connected_1/weights",
+        "outputBiases": "fully_connected_1/biases",
+    }
+
+    # Create a policy from its arrays.  Prefer load.
+    # @param arrays map from each key of CHECKPOINT_NAMES to its array
+    # @param bnMode "batch" to normalize with batch statistics, "moving" for the moving averages
+    def __init__(self, arrays, bnMode="batch"):
+        for name in NFSPPolicy.CHECKPOINT_NAMES:
+            setattr(self, name, np.asarray(arrays[name], dtype=np.float64))
+        self.bnMode = bnMode
+
+    # Load a policy exported by export.
+    # @param path .npz file
+    # @return corresponding NFSPPolicy
+    def load(path):
+        with np.load(path) as data:
+            if int(data["version"]) != NFSPPolicy.FORMAT_VERSION:
+                raise ValueError("%s is not an NFSP policy of version %d" % (path, NFSPPolicy.FORMAT_VERSION))
+            arrays = {name: data[name] for name in NFSPPolicy.CHECKPOINT_NAMES}
+            return NFSPPolicy(arrays, str(data["bnMode"]))
+
+    # Read the average policy variables of an NFSP checkpoint into a .npz file.  Needs TensorFlow.
+    # @param checkpointDir directory holding the checkpoint (e.g. gin_rummy_nfsp4)
+    # @param path .npz file to write
+    # @param scope variable scope of the average policy network (NFSPPlayer's agent 'nfsp0' keeps it in 'nfsp0/sl')
+    # @param bnMode "batch" or "moving", see the header of this file
+    def export(checkpointDir, path, scope="nfsp0/sl", bnMode="batch"):
+        import tensorflow as tf
+        reader = tf.train.load_checkpoint(tf.train.latest_checkpoint(checkpointDir))
+        available = reader.get_variable_to_shape_map()
+        arrays = {}
+        for name, suffix in NFSPPolicy.CHECKPOINT_NAMES.items():
+            variable = scope + "/" + suffix
+            if variable not in available:
+                raise KeyError("%s not found in %s; variables are:\n%s" % (variable, checkpointDir, "\n".join(sorted(available))))
+            arrays[name] = reader.get_tensor(variable)
+        np.savez(path, version=NFSPPolicy.FORMAT_VERSION, bnMode=bnMode, **arrays)
+
+    # Return the action probabilities for a batch of observations.
+    # @param obs array of shape (numSamples, 4, 52) or (numSamples, 208)
+    # @return array of shape (numSamples, numActions)
+    def actionProbs(self, obs):
+        X = np.asarray(obs, dtype=np.float64).reshape(len(obs), -1)
+        if self.bnMode == "batch":
+            mean = X.mean(axis=0)
+            variance = X.var(axis=0)
+        else:
+            mean = self.movingMean
+            variance = self.movingVariance
+        X = (X - mean) / np.sqrt(variance + NFSPPolicy.BN_EPSILON) * self.gamma + self.beta
+        hidden = np.tanh(X @ self.hiddenWeights + self.hiddenBiases)
+        logits = hidden @ self.outputWeights + self.outputBiases
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    # Mask out illegal actions and renormalize, as rlcard's remove_illegal.
+    # @param probs action probabilities
+    # @param legalActions legal action ids
+    # @return masked action probabilities
+    def removeIllegal(probs, legalActions):
+        masked = np.zeros(probs.shape[0])
+        masked[legalActions] = probs[legalActions]
+        if np.sum(masked) == 0:
+            masked[legalActions] = 1 / len(legalActions)
+        else:
+            masked /= sum(masked)
+        return masked
+
+    # Choose an action for one observation, as NFSPAgent.eval_step with the average policy.
+    # @param obs observation of shape (4, 52)
+    # @param legalActions legal action ids
+    # @return (action, masked action probabilities)
+    def evalStep(self, obs, legalActions):
+        probs = NFSPPolicy.removeIllegal(self.actionProbs(np.expand_dims(obs, axis=0))[0], legalActions)
+        action = np.random.choice(len(probs), p=probs)
+        return action, probs
+
+# Export a checkpoint directory to a .npz policy.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export the average policy of an NFSP checkpoint for NumpyNFSPPlayer.')
+    parser.add_argument('checkpointDir', help='checkpoint directory, e.g. ../Old/gin_rummy_nfsp4')
+    parser.add_argument('path', help='.npz file to write, e.g. nfsp4.npz')
+    parser.add_argument('--scope', default='nfsp0/sl', help='variable scope of the average policy network')
+    parser.add_argument('--moving-stats', action='store_true', help='normalize with the moving averages instead of batch statistics')
+    args = parser.parse_args()
+
+    NFSPPolicy.export(args.checkpointDir, args.path, args.scope, "moving" if args.moving_stats else "batch")
+    policy = NFSPPolicy.load(args.path)
+    print("Exported %s: %d inputs, %d hidden units, %d actions." % \
+        (args.path, policy.hiddenWeights.shape[0], policy.hiddenWeights.shape[1], policy.outputWeights.shape[1]))
@@ -0,0 +1,160 @@
+# -------------------------------------------------------------------------------
+#  NumpyNFSPPlayer
+#  Plays exactly as Old/NFSPPlayer.py, but evaluates the exported NFSP average
+#  policy with NFSPPolicy (NumPy) instead of restoring the TensorFlow graph and
+#  rlcard agent.  Export the checkpoint once with NFSPPolicy.py.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+from typing import List, TypeVar
+from random import randint
+from GinRummyUtil import GinRummyUtil
+from GinRummyPlayer import GinRummyPlayer
+from NFSPPolicy import NFSPPolicy
+
+import numpy as np
+
+CardObj = TypeVar('Card')
+
+class NumpyNFSPPlayer(GinRummyPlayer):
+
+    # Rows of the 4x52 observation.
+    HAND = 0
+    TOP_DISCARD = 1
+    DEAD_CARDS = 2
+    OPPONENT_KNOWN_CARDS = 3
+
+    # ====================================
+    # Action_ids:
+    #        2 -> draw_card_id
+    #        3 -> pick_up_discard_id
+    #        6 to 57 -> discard_id card_id
+    # ====================================
+    DRAW_CARD_ACTION = 2
+    PICK_UP_DISCARD_ACTION = 3
+    DISCARD_ACTION_OFFSET = 6
+
+    # Exported policies, shared by all players of this process.
+    policies = {}
+
+    # @param policyPath .npz written by NFSPPolicy.export
+    def __init__(self, policyPath="nfsp4.npz"):
+        if policyPath not in NumpyNFSPPlayer.policies:
+            NumpyNFSPPlayer.policies[policyPath] = NFSPPolicy.load(policyPath)
+        self.policy = NumpyNFSPPlayer.policies[policyPath]
+
+    def _setDiscard(self, card):
+        self.obs[NumpyNFSPPlayer.TOP_DISCARD] = 0
+        self.obs[NumpyNFSPPlayer.TOP_DISCARD][card.getId()] = 1
+
+    # Inform player of 0-based player number (0/1), starting player number (0/1), and dealt cards
+    # @param playerNum player's 0-based player number (0/1)
+    # @param startingPlayerNum starting player number (0/1)
+    # @param cards dealt cards
+    def startGame(self, playerNum: int, startingPlayerNum: int, cards: List[CardObj]) -> None:
+        self.playerNum = playerNum
+        self.startingPlayerNum = startingPlayerNum
+        self.cards = list(cards)
+        self.opponentKnocked = False
+        self.faceUpCard = None
+        self.drawnCard = None
+        self.obs = np.zeros((4, 52), dtype=int)
+        for card in self.cards:
+            self.obs[NumpyNFSPPlayer.HAND][card.getId()] = 1
+
+    # Return whether or not player will draw the given face-up card on the draw pile.
+    # @param card face-up card on the draw pile
+    # @return whether or not player will draw the given face-up card on the draw pile
+    def willDrawFaceUpCard(self, card: CardObj) -> bool:
+        self.faceUpCard = card
+        self._setDiscard(card)
+        action, _ = self.policy.evalStep(self.obs, [NumpyNFSPPlayer.DRAW_CARD_ACTION, NumpyNFSPPlayer.PICK_UP_DISCARD_ACTION])
+        return action == NumpyNFSPPlayer.PICK_UP_DISCARD_ACTION
+
+    # Report that the given player has drawn a given card and, if known, what the card is.
+    # If the card is unknown because it is drawn from the face-down draw pile, the drawnCard is None.
+    # @param playerNum - player drawing a card
+    # @param drawnCard - the card drawn or null, depending on whether the card is known to the player or not, respectively.
+    def reportDraw(self, playerNum: int, drawnCard: CardObj) -> None:
+        if playerNum == self.playerNum:
+            self.cards.append(drawnCard)
+            self.drawnCard = drawnCard
+            self.obs[NumpyNFSPPlayer.HAND][drawnCard.getId()] = 1
+        elif drawnCard is not None:
+            self.obs[NumpyNFSPPlayer.OPPONENT_KNOWN_CARDS][drawnCard.getId()] = 1
+
+    # Get the player's discarded card.  If you took the top card from the discard pile,
+    # you must discard a different card.
+    # @return the player's chosen card for discarding
+    def getDiscard(self) -> CardObj:
+        legalActions = []
+        for card in self.cards:
+            if card == self.drawnCard and self.drawnCard == self.faceUpCard:
+                continue
+            legalActions.append(card.getId() + NumpyNFSPPlayer.DISCARD_ACTION_OFFSET)
+        action, _ = self.policy.evalStep(self.obs, legalActions)
+        for card in self.cards:
+            if card.getId() == action - NumpyNFSPPlayer.DISCARD_ACTION_OFFSET:
+                return card
+
+    # Report that the given player has discarded a given card.
+    # @param playerNum the discarding player
+    # @param discardedCard the card that was discarded
+    def reportDiscard(self, playerNum: int, discardedCard: CardObj) -> None:
+        if playerNum == self.playerNum:
+            self.cards.remove(discardedCard)
+            self.obs[NumpyNFSPPlayer.HAND][discardedCard.getId()] = 0
+        else:
+            self.obs[NumpyNFSPPlayer.OPPONENT_KNOWN_CARDS][discardedCard.getId()] = 0
+        self._setDiscard(discardedCard)
+
+    # Knock with a best meld set as soon as deadwood allows, as NFSPPlayer does.
+    # @return null if continuing play and opponent hasn't melded, or an ArrayList of ArrayLists of melded cards.
+    def getFinalMelds(self) -> List[List[CardObj]]:
+        bestMeldSets = GinRummyUtil.cardsToBestMeldSets(self.cards) # List[List[List[Card]]]
+        if not self.opponentKnocked and (len(bestMeldSets) == 0 or \
+            GinRummyUtil.getDeadwoodPoints1(bestMeldSets[0], self.cards) > \
+            GinRummyUtil.MAX_DEADWOOD):
+            return None
+        if len(bestMeldSets) == 0:
+            return []
+        return bestMeldSets[randint(0, len(bestMeldSets)-1)]
+
+    # When an player has ended play and formed melds, the melds (and deadwood) are reported to both players.
+    # @param playerNum player that has revealed melds
+    # @param melds an ArrayList of ArrayLists of melded cards with the last ArrayList (possibly empty) being deadwood.
+    def reportFinalMelds(self, playerNum: int, melds: List[List[CardObj]]) -> None:
+        if playerNum != self.playerNum:
+            self.opponentKnocked = True
+        # add dead cards to the observation.
+        for meld in melds:
+            for card in meld:
+                self.obs[NumpyNFSPPlayer.DEAD_CARDS][card.getId()] = 1
+
+    def reportScores(self, scores: List[int]) -> None:
+        return
+
+    def reportLayoff(self, playerNum: int, layoffCard: CardObj, opponentMeld: List[CardObj]) -> None:
+        return
+
+    def reportFinalHand(self, playerNum: int, hand: List[CardObj]) -> None:
+        return
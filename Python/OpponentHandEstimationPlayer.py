@@ -35,58 +35,128 @@ from GinRummyUtil import GinRummyUtil
 from GinRummyPlayer import GinRummyPlayer
 from Card import Card
 
+import time
+
 import numpy as np
-import dill
+from ModelRegistry import ModelRegistry
+from PlayerParameters import PlayerParameters
 
 CardObj = TypeVar('Card')
 
+# Return a table of OpponentHandEstimationPlayer.MELD_COMPLETIONS.
+# Runs are judged on id distance alone, matching the original pairwise scoring.
+# @param allSetSuits whether every other suit completes a set, or only the suits above the lower card
+# @return array of shape (52, 52, 2) of card ids, padded with 52
+def _meldCompletions(allSetSuits=True):
+    table = np.full((52, 52, 2), 52, dtype=np.intp)
+    for lowId in range(52):
+        for highId in range(lowId + 1, 52):
+            completions = []
+            # Run?
+            if highId - lowId == 2:
+                completions.append((highId + lowId) // 2) # in between
+            elif highId - lowId == 1:
+                if lowId != 0:
+                    completions.append(lowId - 1) # below
+                if highId != 51:
+                    completions.append(highId + 1) # above
+            # Set?
+            if (highId - lowId) % 13 == 0:
+                for i in range(lowId % 13 if allSetSuits else lowId + 13, 52, 13):
+                    if i != highId and i != lowId:
+                        completions.append(i)
+            table[lowId, highId, :len(completions)] = completions
+            table[highId, lowId, :len(completions)] = completions
+    return table
+
 class OpponentHandEstimationPlayer(GinRummyPlayer):
 
     #---------------------------------------------------------------------------
     # FUNCTIONS FOR THE RANDOM FORREST CLASSIFIER
 
-    def _waysCompleteMeld(self, card1, card2, probs):
-        ways = 0
-
-        # Run?
-        highId = max(card1.getId(), card2.getId())
-        lowId = min(card1.getId(), card2.getId())
-        if highId - lowId <= 2:
-            if highId - lowId == 2:
-                ways += (1 - self.unavailableCards[(highId + lowId) // 2]) * (1 - probs[(highId + lowId) // 2]**4) # in between is available
-                ways += 2 if self.ownCards[(highId + lowId) // 2] == 1 else 0 # we actually have that meld
-            else:
-                if lowId != 0:
-                    ways += (1 - self.unavailableCards[lowId - 1]) * (1 - probs[lowId - 1]**4) # below is available
-                    ways += 2 if self.ownCards[lowId - 1] == 1 else 0 # we actually have that meld
-                if highId != 51:
-                    ways += (1 - self.unavailableCards[highId + 1]) * (1 - probs[highId + 1]**4) # above is available
-                    ways += 2 if self.ownCards[highId + 1] == 1 else 0 # we actually have that meld
-        # Set?
-        if (highId - lowId) % 13 == 0:
-            i = lowId % 13
-            while i < 52:
-                if i != highId and i != lowId:
-                    ways += (1 - self.unavailableCards[i]) * (1 - probs[i]**4)
-                    ways += 2 if self.ownCards[i] == 1 else 0 # we actually have that meld
-                i += 13
-        return ways
+    # MELD_COMPLETIONS[id1][id2] lists the ids of the (at most 2) cards that would
+    # complete a run or set together with cards id1 and id2, padded with NUM_CARDS.
+    # UPPER_SET_MELD_COMPLETIONS only completes a set with the suits above the lower
+    # card, as OldAgents 05 did (PlayerParameters allSetSuits 0).
+    MELD_COMPLETIONS = _meldCompletions()
+    UPPER_SET_MELD_COMPLETIONS = _meldCompletions(allSetSuits=False)
+
+    # Return, for each card, the summed ways its pairs with the other cards can complete a meld.
+    # A completing card counts by how likely it is to still be available (1 - p**probExponent
+    # for the estimated probability p that the opponent holds it), plus ownCardBonus if we hold it.
+    # @param cards cards to score pairwise
+    # @param probs estimated probability that the opponent holds each card
+    # @return array parallel to cards
+    def _waysCompleteMelds(self, cards, probs):
+        ids = np.array([card.getId() for card in cards], dtype=np.intp)
+        first, second = np.triu_indices(len(cards), 1)
+        table = OpponentHandEstimationPlayer.MELD_COMPLETIONS if self.params.allSetSuits \
+            else OpponentHandEstimationPlayer.UPPER_SET_MELD_COMPLETIONS
+        completions = table[ids[first], ids[second]]
+
+        # Index NUM_CARDS (padding) scores 0.
+        available = np.append((1 - self.unavailableCards) * (1 - probs**self.params.probExponent), 0) # completing card is available
+        owned = np.append(np.where(self.ownCards == 1, self.params.ownCardBonus, 0), 0) # we actually have that meld
+        ways = available[completions[:, 0]] + owned[completions[:, 0]] \
+            + available[completions[:, 1]] + owned[completions[:, 1]]
+
+        # Accumulate each pair's ways onto both of its cards.
+        return np.bincount(np.stack([first, second], axis=1).ravel(), weights=np.repeat(ways, 2), minlength=len(cards))
 
     def _predictOpponentHand(self):
-        probs = self.rf.predict_proba([self.state])
-        return np.array(probs)[:,:,1][:,0]
+        if self.inference is not None:
+            return self.inference.predict(self.rf, self.state)
+        return self.rf.predictProba(self.state[np.newaxis])[0]
+
+    # Set one entry of the state, bumping stateVersion only if the value changes.
+    # @param row view into self.state (oppPastDiscards, oppKnownCards or ownCards)
+    # @param cardId card id number indexing the row
+    # @param value new value of the entry
+    def _setState(self, row, cardId, value):
+        if row[cardId] != value:
+            row[cardId] = value
+            self.stateVersion += 1
+
+    # Return the estimated probability that the opponent holds each card.
+    # The forest only runs when the state changed since the last call, so knock and
+    # face-up draw decisions may use this freely.  Do not modify the result.
+    # @return array of 52 probabilities indexed by card id number
+    def getOpponentHandProbabilities(self):
+        if self.probsVersion != self.stateVersion:
+            startTime = time.perf_counter()
+            self.probs = np.array(self._predictOpponentHand())
+            self.inferenceSeconds += time.perf_counter() - startTime
+            self.probs.setflags(write=False)
+            self.probsVersion = self.stateVersion
+        return self.probs
 
     #---------------------------------------------------------------------------
 
-    def __init__(self):
-        # Random Forrest Classifier
-        self.rf = dill.load(open("rf2.obj","rb"))
-        self.alpha = 0.15
-        self.beta = 0.85
+    # @param modelPath model directory or pickle (the ModelRegistry active model if None,
+    #        picked up again at the start of every game)
+    # @param params PlayerParameters (the defaults if None)
+    def __init__(self, modelPath=None, params=None):
+        # Random Forrest Classifier, shared with every other player in this process.
+        self.modelPath = modelPath
+        self.rf = ModelRegistry.get(modelPath)
+        self.inference = None
+        # Total seconds spent running the model.
+        self.inferenceSeconds = 0.0
+        self.params = params if params is not None else PlayerParameters()
+
+    # Set the heuristic constants.  Takes effect from the next decision.
+    # @param params PlayerParameters
+    def setParameters(self, params):
+        self.params = params
 
     def setAlpha(self, alpha):
-        self.alpha = alpha
-        self.beta = 1 - alpha
+        self.params = self.params.replace(alpha=alpha)
+
+    # Route predictions through a shared InferenceService (None to call the model directly).
+    # Only pays off when players run in several threads of one process.
+    # @param inference InferenceService batching predictions across players (each with its own model)
+    def setInferenceService(self, inference):
+        self.inference = inference
 
     # Inform player of 0-based player number (0/1), starting player number (0/1), and dealt cards
     # @param playerNum player's 0-based player number (0/1)
@@ -96,6 +166,8 @@ class OpponentHandEstimationPlayer(GinRummyPlayer):
         self.playerNum = playerNum
         self.startingPlayerNum = startingPlayerNum
         self.cards = list(cards)
+        # Switch to a reloaded model between games only.
+        self.rf = ModelRegistry.get(self.modelPath)
         self.opponentKnocked = False
         self.drawDiscardBitstrings = [] # long[], or List[int]
         self.faceUpCard = None
@@ -119,6 +191,11 @@ class OpponentHandEstimationPlayer(GinRummyPlayer):
         for card in cards:
             self.ownCards[card.getId()] =  1
 
+        # Cached opponent hand probabilities, valid while probsVersion == stateVersion.
+        self.stateVersion = 0
+        self.probsVersion = -1
+        self.probs = None
+
     # Return whether or not player will draw the given face-up card on the draw pile.
     # @param card face-up card on the draw pile
     # @return whether or not player will draw the given face-up card on the draw pile
@@ -142,13 +219,13 @@ class OpponentHandEstimationPlayer(GinRummyPlayer):
         if playerNum == self.playerNum:
             self.cards.append(drawnCard)
             self.drawnCard = drawnCard
-            self.ownCards[drawnCard.getId()] = 1
+            self._setState(self.ownCards, drawnCard.getId(), 1)
         else:
             if drawnCard != None:
-                self.oppKnownCards[drawnCard.getId()] = 1
+                self._setState(self.oppKnownCards, drawnCard.getId(), 1)
             else:
                 self.unavailableCards[self.faceUpCard.getId()] = 1
-                self.oppPastDiscards[self.faceUpCard.getId()] = 1
+                self._setState(self.oppPastDiscards, self.faceUpCard.getId(), 1)
 
     def getLinComb(self, cards, alpha):
         # Find deadwood of hand w/o each card.
@@ -166,19 +243,9 @@ class OpponentHandEstimationPlayer(GinRummyPlayer):
             deadwoodArr[i] = deadwood
 
 
-        # Find available melds for each card.
-        meldsArr = np.zeros(len(cards)) # parallel
-
-        probs = self._predictOpponentHand()
-
-        # Look at cards pairwise for availability of melds.
-        for i in range(len(cards)):
-            for j in range(i + 1, len(cards)):
-                card1 = cards[i]
-                card2 = cards[j]
-                ways = self._waysCompleteMeld(card1, card2, probs)
-                meldsArr[i] += ways
-                meldsArr[j] += ways
+        # Find available melds for each card, looking at cards pairwise.
+        probs = self.getOpponentHandProbabilities()
+        meldsArr = self._waysCompleteMelds(cards, probs) # parallel
 
         return meldsArr * alpha + deadwoodArr * (1-alpha)
 
@@ -188,7 +255,7 @@ class OpponentHandEstimationPlayer(GinRummyPlayer):
     # @return the player's chosen card for discarding
     def getDiscard(self) -> CardObj:
 
-        linComb = self.getLinComb(self.cards, 1-np.sqrt(self.round/10))
+        linComb = self.getLinComb(self.cards, self.params.meldWeight(self.round))
 
         minArg = np.argmin(linComb)
         if self.cards[minArg] == self.drawnCard and self.drawnCard == self.faceUpCard:
@@ -204,10 +271,10 @@ class OpponentHandEstimationPlayer(GinRummyPlayer):
         self.round += 1
         if playerNum == self.playerNum:
             self.cards.remove(discardedCard)
-            self.ownCards[discardedCard.getId()] = 0
+            self._setState(self.ownCards, discardedCard.getId(), 0)
         else:
-            self.oppKnownCards[discardedCard.getId()] = 0
-            self.oppPastDiscards[discardedCard.getId()] = 1
+            self._setState(self.oppKnownCards, discardedCard.getId(), 0)
+            self._setState(self.oppPastDiscards, discardedCard.getId(), 1)
 
     # At the end of each turn, this method is called and the player that cannot (or will not) end the round will return a null value.
     # However, the first player to "knock" (that is, end the round), and then their opponent, will return an ArrayList of ArrayLists of melded cards.
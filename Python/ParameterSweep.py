@@ -0,0 +1,373 @@
+# -------------------------------------------------------------------------------
+#  ParameterSweep
+#  Plays OpponentHandEstimationPlayer against SimpleGinRummyPlayer over a grid of
+#  player parameters on all cores, replacing the sequential loops of
+#  GinRummyGame2.py and GinRummyGame3.py.
+#
+#  The games of every grid point are cut into chunks, and each (point, chunk)
+#  job runs in a pool of worker processes forked after the model is loaded, so
+#  the workers share it.  Each job seeds its own deals from the point and the
+#  chunk number, so a job always plays the same games.  Finished jobs are
+#  appended to the output CSV at once; running the same sweep again skips the
+#  jobs already in it, so an interrupted sweep resumes where it stopped.  The
+#  CSV starts with the seed and chunk size, and a sweep with other ones refuses
+#  to resume from it, since its chunks would hold different deals.
+#
+#    $ python3 ParameterSweep.py --param mixingRounds=0 --param alpha=0.10:0.35:7 --games 200 \
+#          --out with_rf2-2.jobs.csv --summary with_rf2-2.csv
+#
+#  With --crn (common random numbers) every grid point plays the same seeded
+#  deals, each once in both seat orders, so luck of the deal cancels out when
+#  points are compared.  Each point then gets its win rate and its paired
+#  difference to a reference point, with standard errors; the paired standard
+#  error is usually far below the unpaired one, so fewer games resolve the
+#  same difference.
+#
+#  A parameter is given as name=low:high:count (evenly spaced, like np.linspace)
+#  or name=v1,v2,...; several parameters span their product.  Parameter names
+#  are those of PlayerParameters (alpha, probExponent, ownCardBonus,
+#  mixingRounds, allSetSuits); the others keep their defaults.  alpha is only
+#  used when mixingRounds is 0, so a grid varying alpha at any point with
+#  another mixingRounds (including the default 10) is rejected.  --variant NAME instead adds a
+#  named parameter set of PlayerParameters.VARIANTS as a point, so old agent
+#  variants are compared in one sweep, sharing one model load.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from GinRummyGame import GinRummyGame
+from ModelRegistry import ModelRegistry
+from OpponentHandEstimationPlayer import OpponentHandEstimationPlayer
+from PlayerParameters import PlayerParameters
+from ResultsStore import ResultsStore
+from SimpleGinRummyPlayer import SimpleGinRummyPlayer
+
+class ParameterSweep:
+
+    # Game and player of this worker process, created on its first job, and the
+    # game with the seats swapped.  The player is "ohe" and its opponent "simple"
+    # in the ResultsStore.
+    game = None
+    swappedGame = None
+    player = None
+
+    # Last output column in plain and in common random numbers mode: one digit per
+    # game (wins), or per deal (wins over both seat orders).
+    OUTCOMES = "outcomes"
+    PAIRED_OUTCOMES = "pairedOutcomes"
+
+    # Parse parameter specifications into grid points.
+    # @param specs list of name=low:high:count or name=v1,v2,... strings
+    # @return list of points, each a list of (name, value) pairs (raises ValueError
+    #         if alpha varies at points where mixingRounds is not 0, which ignore it)
+    def parseGrid(specs):
+        axes = []
+        for spec in specs:
+            name, _, values = spec.partition("=")
+            if not values:
+                raise ValueError("parameter %s has no values" % spec)
+            if ":" in values:
+                low, high, count = values.split(":")
+                axis = np.linspace(float(low), float(high), int(count)).tolist()
+            else:
+                axis = [float(value) for value in values.split(",")]
+            axes.append([(name, value) for value in axis])
+        points = [list(point) for point in itertools.product(*axes)]
+
+        if len({dict(point).get("alpha") for point in points}) > 1:
+            defaultRounds = PlayerParameters().mixingRounds
+            if any(dict(point).get("mixingRounds", defaultRounds) != 0 for point in points):
+                raise ValueError("alpha is ignored unless mixingRounds is 0; add --param mixingRounds=0 to sweep it")
+        return points
+
+    # Return the grid points of named parameter sets.
+    # @param names names in PlayerParameters.VARIANTS
+    # @return list of points, each a list of (name, value) pairs of every parameter
+    def variantPoints(names):
+        for name in names:
+            if name not in PlayerParameters.VARIANTS:
+                raise ValueError("unknown variant %s (known: %s)" % (name, ", ".join(PlayerParameters.VARIANTS)))
+        return [PlayerParameters.VARIANTS[name].point() for name in names]
+
+    # Apply a grid point to a player, starting from the default parameters.
+    # @param player player to configure
+    # @param point list of (name, value) pairs
+    def configure(player, point):
+        player.setParameters(PlayerParameters().replace(**dict(point)))
+
+    # Return the key identifying a job in the output CSV.
+    # @param point list of (name, value) pairs
+    # @param chunk chunk number
+    # @return tuple of the values and the chunk, as they are written to the CSV
+    def jobKey(point, chunk):
+        return tuple(repr(value) for _, value in point) + (str(chunk),)
+
+    # Play one game, recording it in the ResultsStore if one was started.
+    # @param game GinRummyGame to play
+    # @param agents names of the agents in seat 0 and seat 1
+    # @param point list of (name, value) pairs the player is configured with
+    # @param seed deal seed (None for the global random state)
+    # @return the winning seat 0 or 1
+    def playGame(game, agents, point, seed=None):
+        startTime = time.perf_counter()
+        winner = game.play(seed)
+        ResultsStore.recordGame(game, agents, winner, time.perf_counter() - startTime, seed, point)
+        return winner
+
+    # Play one chunk of games at a grid point (in a worker process).
+    # @param point list of (name, value) pairs
+    # @param chunk chunk number
+    # @param first index of the first deal of the chunk (common random numbers only)
+    # @param count games to play, or deals in common random numbers mode
+    # @param seed base seed of the sweep
+    # @param crn whether to play seeded deals in both seat orders
+    # @return (point, chunk, games, wins of the configured player, seconds, outcome digits)
+    def playJob(point, chunk, first, count, seed, crn):
+        if ParameterSweep.game is None:
+            ParameterSweep.player = OpponentHandEstimationPlayer()
+            opponent = SimpleGinRummyPlayer()
+            ParameterSweep.game = GinRummyGame(opponent, ParameterSweep.player)
+            ParameterSweep.swappedGame = GinRummyGame(ParameterSweep.player, opponent)
+        ParameterSweep.configure(ParameterSweep.player, point)
+
+        startTime = time.perf_counter()
+        outcomes = []
+        if crn:
+            for deal in range(first, first + count):
+                dealSeed = "%d deal %d" % (seed, deal)
+                win = ParameterSweep.playGame(ParameterSweep.game, ("simple", "ohe"), point, dealSeed)
+                outcomes.append(win + 1 - ParameterSweep.playGame(ParameterSweep.swappedGame, ("ohe", "simple"), point, dealSeed))
+            games = 2 * count
+        else:
+            random.seed("%d %s %d" % (seed, point, chunk))
+            for _ in range(count):
+                outcomes.append(ParameterSweep.playGame(ParameterSweep.game, ("simple", "ohe"), point))
+            games = count
+        return point, chunk, games, sum(outcomes), time.perf_counter() - startTime, "".join(str(o) for o in outcomes)
+
+    # Read the jobs already finished from an output CSV.
+    # @param path output CSV
+    # @param header header rows the CSV must start with
+    # @return map from job key to (games, wins, outcome digits)
+    def readFinished(path, header):
+        finished = {}
+        if not os.path.exists(path):
+            return finished
+        with open(path, newline='') as csvfile:
+            rows = csv.reader(csvfile)
+            if [next(rows, None) for _ in header] != header:
+                raise ValueError("%s holds a different sweep (header is not %s)" % (path, " / ".join(",".join(row) for row in header)))
+            for row in rows:
+                # Values..., chunk, games, wins, seconds, outcomes
+                finished[tuple(row[:-4])] = (int(row[-4]), int(row[-3]), row[-1])
+        return finished
+
+    # Return the header of the output CSV of a sweep: the seed and chunk size, which
+    # decide the deals of every chunk, then the column names.  A sweep only resumes
+    # from a CSV with the same header.
+    # @param points grid points
+    # @param crn whether the sweep uses common random numbers
+    # @param seed base seed
+    # @param perChunk games (or deals) per job
+    # @return list of header rows
+    def header(points, crn, seed, perChunk):
+        return [["seed=%d" % seed, "perChunk=%d" % perChunk],
+            [name for name, _ in points[0]] + ["chunk", "games", "wins", "seconds",
+            ParameterSweep.PAIRED_OUTCOMES if crn else ParameterSweep.OUTCOMES]]
+
+    # Return the jobs playing the first count games (or deals) of a point that are not finished yet.
+    # @param point list of (name, value) pairs
+    # @param count games, or deals in common random numbers mode
+    # @param perChunk games (or deals) per job
+    # @param seed base seed
+    # @param crn whether to play common seeded deals in both seat orders
+    # @param finished map from job key to results of the jobs already played
+    # @return list of playJob argument tuples
+    def jobsFor(point, count, perChunk, seed, crn, finished):
+        jobs = []
+        for chunk in range((count + perChunk - 1) // perChunk):
+            if ParameterSweep.jobKey(point, chunk) not in finished:
+                first = chunk * perChunk
+                jobs.append((point, chunk, first, min(perChunk, count - first), seed, crn))
+        return jobs
+
+    # Start a pool of worker processes.  The model is loaded first, so the forked workers share it.
+    # @param processes number of worker processes
+    # @return ProcessPoolExecutor running playJob
+    def startPool(processes):
+        ModelRegistry.preload()
+        return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("fork"))
+
+    # Run jobs on a pool, recording each result as soon as it is in.
+    # @param executor pool from startPool
+    # @param jobs list of playJob argument tuples
+    # @param finished map from job key to (games, wins, outcome digits) to add the results to
+    # @param outPath output CSV to append the results to (None for none)
+    # @param header header rows of the output CSV
+    def runJobs(executor, jobs, finished, outPath=None, header=None):
+        csvfile = None
+        if outPath is not None:
+            writeHeader = not os.path.exists(outPath)
+            csvfile = open(outPath, 'a', newline='')
+            csvwriter = csv.writer(csvfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            if writeHeader:
+                csvwriter.writerows(header)
+        try:
+            futures = [executor.submit(ParameterSweep.playJob, *job) for job in jobs]
+            for future in as_completed(futures):
+                point, chunk, games, wins, seconds, outcomes = future.result()
+                key = ParameterSweep.jobKey(point, chunk)
+                finished[key] = (games, wins, outcomes)
+                if csvfile is not None:
+                    csvwriter.writerow(list(key) + [games, wins, seconds, outcomes])
+                    csvfile.flush()
+        finally:
+            if csvfile is not None:
+                csvfile.close()
+
+    # Run every job of a sweep not finished yet, appending each result to the output CSV.
+    # @param points grid points
+    # @param numGames games per point
+    # @param chunkSize games per job
+    # @param outPath output CSV
+    # @param processes number of worker processes
+    # @param seed base seed
+    # @param crn whether to play common seeded deals in both seat orders
+    # @return map from job key to (games, wins, outcome digits), covering every job of the sweep
+    def run(points, numGames, chunkSize, outPath, processes, seed=0, crn=False):
+        # Cut games (or deals, each played twice) into chunks.
+        count, perChunk = ((numGames + 1) // 2, max(1, chunkSize // 2)) if crn else (numGames, chunkSize)
+        header = ParameterSweep.header(points, crn, seed, perChunk)
+        finished = ParameterSweep.readFinished(outPath, header)
+        jobs = []
+        for point in points:
+            jobs += ParameterSweep.jobsFor(point, count, perChunk, seed, crn, finished)
+        print("%d of %d jobs left" % (len(jobs), len(points) * ((count + perChunk - 1) // perChunk)))
+        if jobs:
+            with ParameterSweep.startPool(processes) as executor:
+                ParameterSweep.runJobs(executor, jobs, finished, outPath, header)
+        return finished
+
+    # Sum the finished jobs of every grid point.
+    # @param points grid points
+    # @param finished map from job key to (games, wins, outcome digits)
+    # @return list of (point, games, wins), parallel to points
+    def summarize(points, finished):
+        summary = []
+        for point in points:
+            prefix = tuple(repr(value) for _, value in point)
+            games = wins = 0
+            for key, (jobGames, jobWins, _) in finished.items():
+                if key[:-1] == prefix:
+                    games += jobGames
+                    wins += jobWins
+            summary.append((point, games, wins))
+        return summary
+
+    # Return the outcomes of a grid point in deal order.
+    # @param point list of (name, value) pairs
+    # @param finished map from job key to (games, wins, outcome digits)
+    # @return array of outcomes (wins per game, or per deal over both seat orders)
+    def outcomes(point, finished):
+        prefix = tuple(repr(value) for _, value in point)
+        chunks = sorted((int(key[-1]), digits) for key, (_, _, digits) in finished.items() if key[:-1] == prefix)
+        return np.array([int(digit) for _, digits in chunks for digit in digits])
+
+    # Compare every grid point with a reference point on common deals.
+    # @param points grid points played in common random numbers mode
+    # @param finished map from job key to (games, wins, outcome digits)
+    # @param reference index of the reference point
+    # @return list parallel to points of maps with the win rate "rate" and its standard error "se",
+    #         the paired difference to the reference "diff" with its standard error "pairedSe", and
+    #         the standard error "unpairedSe" the difference would have on independent deals
+    def pairedStats(points, finished, reference=0):
+        # Per deal win rate over both seat orders, on the deals every point played.
+        scores = [ParameterSweep.outcomes(point, finished) / 2 for point in points]
+        numDeals = min(len(score) for score in scores)
+        scores = [score[:numDeals] for score in scores]
+        standardError = lambda x: x.std(ddof=1) / np.sqrt(len(x)) if len(x) > 1 else float("nan")
+
+        stats = []
+        for score in scores:
+            stats.append({
+                "rate": score.mean(),
+                "se": standardError(score),
+                "diff": (score - scores[reference]).mean(),
+                "pairedSe": standardError(score - scores[reference]),
+                "unpairedSe": np.hypot(standardError(score), standardError(scores[reference])),
+            })
+        return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sweep OpponentHandEstimationPlayer parameters against SimpleGinRummyPlayer.')
+    parser.add_argument('--param', action='append', default=[], help='name=low:high:count or name=v1,v2,... (repeatable)')
+    parser.add_argument('--variant', action='append', default=[], help='named parameter set of PlayerParameters.VARIANTS (repeatable, instead of --param)')
+    parser.add_argument('--games', type=int, default=200, help='games per grid point')
+    parser.add_argument('--chunk', type=int, default=25, help='games per job')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='sweep.csv', help='CSV of finished jobs, appended to and used to resume')
+    parser.add_argument('--summary', default=None, help='CSV to write the win rate of every grid point to')
+    parser.add_argument('--crn', action='store_true', help='play the same deals at every point, in both seat orders')
+    parser.add_argument('--db', default=None, help='SQLite results store to record every game in (see ResultsStore)')
+    parser.add_argument('--reference', type=int, default=0, help='index of the grid point differences are taken to (with --crn)')
+    args = parser.parse_args()
+
+    if bool(args.param) == bool(args.variant):
+        parser.error('give either --param or --variant')
+    try:
+        points = ParameterSweep.parseGrid(args.param) if args.param else ParameterSweep.variantPoints(args.variant)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.db is not None:
+        ResultsStore.start(args.db, "sweep", vars(args))
+    startTime = time.time()
+    try:
+        finished = ParameterSweep.run(points, args.games, args.chunk, args.out, args.processes, args.seed, args.crn)
+    finally:
+        ResultsStore.stop()
+    print("Finished in %.1f s" % (time.time() - startTime))
+
+    if args.crn:
+        print("%-30s %8s %8s %10s %10s %12s" % ("point", "rate", "se", "diff", "paired se", "unpaired se"))
+        for point, stats in zip(points, ParameterSweep.pairedStats(points, finished, args.reference)):
+            print("%-30s %8.4f %8.4f %+10.4f %10.4f %12.4f" % (", ".join("%s=%.4g" % (name, value) for name, value in point),
+                stats["rate"], stats["se"], stats["diff"], stats["pairedSe"], stats["unpairedSe"]))
+
+    summary = ParameterSweep.summarize(points, finished)
+    for point, games, wins in summary:
+        print("Playing with %s, Win Rate: %s" % (", ".join("%s: %s" % (name, value) for name, value in point), wins / games))
+    if args.summary is not None:
+        with open(args.summary, 'w', newline='') as csvfile:
+            csvwriter = csv.writer(csvfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            for point, games, wins in summary:
+                csvwriter.writerow([value for _, value in point] + [wins / games])
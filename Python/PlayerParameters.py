@@ -0,0 +1,97 @@
+# -------------------------------------------------------------------------------
+#  PlayerParameters
+#  Heuristic constants of OpponentHandEstimationPlayer, so that one player
+#  implementation covers the variants that used to be copies of it (see
+#  OldAgents) and sweeps can vary any of them in one process with one model
+#  load.
+#
+#    alpha          meld weight in getDiscard when mixingRounds is 0
+#    probExponent   a completing card counts 1 - p**probExponent for the
+#                   estimated probability p that the opponent holds it
+#    ownCardBonus   what a completing card we hold counts in addition
+#    mixingRounds   rounds over which the meld weight falls from 1 to 0 as
+#                   1 - sqrt(round / mixingRounds); 0 keeps it at alpha
+#    allSetSuits    1 if every other suit of a pair's rank completes a set, 0
+#                   if only the suits above the lower card do (OldAgents 05)
+#
+#  Parameters are values: change them with replace, which returns a copy.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import math
+
+class PlayerParameters:
+
+    # Parameter names, in the order of point().
+    NAMES = ["alpha", "probExponent", "ownCardBonus", "mixingRounds", "allSetSuits"]
+
+    # @param alpha meld weight in getDiscard when mixingRounds is 0
+    # @param probExponent exponent on the probability that the opponent holds a completing card
+    # @param ownCardBonus extra count of a completing card we hold
+    # @param mixingRounds rounds over which the meld weight falls to 0 (0 keeps it at alpha)
+    # @param allSetSuits 1 if every other suit completes a set, 0 for only the suits above the lower card
+    def __init__(self, alpha=0.15, probExponent=4, ownCardBonus=2, mixingRounds=10, allSetSuits=1):
+        self.alpha = alpha
+        self.probExponent = probExponent
+        self.ownCardBonus = ownCardBonus
+        self.mixingRounds = mixingRounds
+        self.allSetSuits = allSetSuits
+
+    # Return a copy with some parameters changed.
+    # @param changes parameter names and their new values
+    # @return new PlayerParameters (raises ValueError for an unknown name)
+    def replace(self, **changes):
+        for name in changes:
+            if name not in PlayerParameters.NAMES:
+                raise ValueError("unknown player parameter %s" % name)
+        values = dict(self.point())
+        values.update(changes)
+        return PlayerParameters(**values)
+
+    # Return the parameters as a ParameterSweep grid point.
+    # @return list of (name, value) pairs in the order of NAMES
+    def point(self):
+        return [(name, getattr(self, name)) for name in PlayerParameters.NAMES]
+
+    # Return the weight of meld potential against deadwood in getDiscard.
+    # @param round number of turns the player has taken this game
+    # @return weight of meld potential (the weight of deadwood is 1 minus it)
+    def meldWeight(self, round):
+        if self.mixingRounds > 0:
+            return 1 - math.sqrt(round / self.mixingRounds)
+        return self.alpha
+
+    def __eq__(self, other):
+        return isinstance(other, PlayerParameters) and self.point() == other.point()
+
+    def __repr__(self):
+        return "PlayerParameters(%s)" % ", ".join("%s=%r" % entry for entry in self.point())
+
+# Named parameter sets.  OldAgents 05 and 06 (rf2 model, fixed meld weight, no
+# exponent on the probabilities; 05 with its set loop over the upper suits only)
+# are expressible; 01 to 04 use the retired 208-input rf.obj model or other
+# discard rules and have no parameter set.
+PlayerParameters.VARIANTS = {
+    "default": PlayerParameters(),
+    "old05": PlayerParameters(alpha=0.45, probExponent=1, mixingRounds=0, allSetSuits=0),
+    "old06": PlayerParameters(alpha=0.15, probExponent=1, mixingRounds=0),
+}
@@ -0,0 +1,255 @@
+# -------------------------------------------------------------------------------
+#  ProtocolClient
+#  Client side of the Server.py text protocol, sending exactly what
+#  PrincetonGinPlayer sends: newline-terminated commands after "hello noack",
+#  with reportDraw skipped for face-down draws of the opponent and
+#  reportFinalMelds carrying only the player number.
+#
+#  With noack the notifications (startGame, reportDraw, reportDiscard,
+#  reportFinalMelds) are only written and need no round trip; decisions
+#  (willDrawFaceUpCard, getDiscard, getFinalMelds) wait for their reply and
+#  their round trip times are recorded per command.  With
+#  batchNotifications the notifications are held back and written together with
+#  the next decision, in a single system call.
+#
+#  With binary the client asks for "hello binary" as well and then sends every
+#  command in the compact framing of BinaryProtocol, decoding the replies the
+#  same way, so benchmarks and load tests can compare it with the text lines.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import json
+import socket
+import struct
+import time
+
+from BinaryProtocol import BinaryProtocol
+from Deck import Deck
+
+class ProtocolClient:
+
+    # Connect to a server.
+    # @param host server host
+    # @param port server port
+    # @param unixPath unix domain socket path (used instead of host and port if given)
+    # @param noAck whether to ask the server not to acknowledge notifications
+    # @param batchNotifications whether to hold notifications back until the next request (needs noack)
+    # @param binary whether to ask for the binary framing of BinaryProtocol
+    def __init__(self, host='localhost', port=41869, unixPath=None, noAck=True, batchNotifications=False, binary=False):
+        self.address = (host, port, unixPath)
+        if unixPath is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unixPath)
+        else:
+            self.sock = socket.create_connection((host, port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+        # Map from decision command to its round trip times in seconds.
+        self.latencies = {}
+
+        # Encoded requests not written yet.
+        self.batchNotifications = batchNotifications
+        self.pending = []
+
+        # Always open with hello: it tells the server to frame commands by newline.
+        self.binary = False
+        options = (["noack"] if noAck else []) + (["binary"] if binary else [])
+        accepted = self.request(None, " ".join(["hello"] + options)).split()
+        self.noAck = "noack" in accepted
+        self.binary = "binary" in accepted
+        if binary and not self.binary:
+            raise ConnectionError("server does not speak the binary protocol")
+
+    # Return the bytes of a request.
+    # @param request command line without its newline, or encoded binary request
+    # @return bytes to write
+    def encode(self, request):
+        return request if isinstance(request, bytes) else bytes(request + "\n", "ascii")
+
+    # Send a request, after any held back notifications, without waiting for a reply.
+    # @param request command line without its newline, or encoded binary request
+    def send(self, request):
+        self.pending.append(self.encode(request))
+        self.flush()
+
+    # Write the held back notifications.
+    def flush(self):
+        if self.pending:
+            self.sock.sendall(b"".join(self.pending))
+            self.pending = []
+
+    # Read one reply line.
+    # @return reply line without its newline
+    def readLine(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return line.decode("ascii").rstrip("\n")
+
+    # Read a binary reply of known length.
+    # @param length number of bytes
+    # @return reply bytes
+    def readBytes(self, length):
+        data = self.reader.read(length)
+        if len(data) < length:
+            raise ConnectionError("server closed the connection")
+        return data
+
+    # Read a one-byte binary reply.
+    # @return reply byte as a number
+    def readByte(self):
+        return self.readBytes(1)[0]
+
+    # Read a binary reply holding a length and text (e.g. stats).
+    # @return reply text
+    def readText(self):
+        return self.readBytes(struct.unpack(">I", self.readBytes(4))[0]).decode("ascii")
+
+    # Send a request and wait for its reply, recording the round trip time.
+    # @param command command name under which to record the time (None to not record it)
+    # @param request command line without its newline, or encoded binary request
+    # @param readReply function reading the reply (reads one line by default)
+    # @return reply
+    def request(self, command, request, readReply=None):
+        startTime = time.perf_counter()
+        self.send(request)
+        reply = readReply() if readReply is not None else self.readLine()
+        if command is not None:
+            self.latencies.setdefault(command, []).append(time.perf_counter() - startTime)
+        return reply
+
+    # Send a notification, reading its acknowledgement unless noack was accepted.
+    # @param request command line without its newline, or encoded binary request
+    def notify(self, request):
+        if self.noAck and self.batchNotifications:
+            self.pending.append(self.encode(request))
+            return
+        self.send(request)
+        if not self.noAck:
+            if self.binary:
+                self.readByte()
+            else:
+                self.readLine()
+
+    def startGame(self, playerNum, startingPlayerNum, cards):
+        if self.binary:
+            self.notify(bytes([BinaryProtocol.START_GAME, playerNum, startingPlayerNum, len(cards)] + [card.getId() for card in cards]))
+        else:
+            self.notify("startGame %d %d %s" % (playerNum, startingPlayerNum, " ".join(str(card) for card in cards)))
+
+    def willDrawFaceUpCard(self, card):
+        if self.binary:
+            return self.request("willDrawFaceUpCard", bytes([BinaryProtocol.WILL_DRAW_FACE_UP_CARD, card.getId()]), self.readByte) == 1
+        return self.request("willDrawFaceUpCard", "willDrawFaceUpCard %s" % card) == "true"
+
+    def reportDraw(self, playerNum, drawnCard):
+        # The server only learns of known cards.
+        if drawnCard is None:
+            return
+        if self.binary:
+            self.notify(bytes([BinaryProtocol.REPORT_DRAW, playerNum, drawnCard.getId()]))
+        else:
+            self.notify("reportDraw %d %s" % (playerNum, drawnCard))
+
+    def getDiscard(self):
+        if self.binary:
+            return Deck.allCards[self.request("getDiscard", bytes([BinaryProtocol.GET_DISCARD]), self.readByte)]
+        return Deck.strCardMap[self.request("getDiscard", "getDiscard")]
+
+    def reportDiscard(self, playerNum, discardedCard):
+        if self.binary:
+            self.notify(bytes([BinaryProtocol.REPORT_DISCARD, playerNum, discardedCard.getId()]))
+        else:
+            self.notify("reportDiscard %d %s" % (playerNum, discardedCard))
+
+    # Read the reply to getFinalMelds: one meld per line, ended by an empty line, or "null".
+    # @return list of melds, or None
+    def readMelds(self):
+        line = self.readLine()
+        if line == "null":
+            return None
+        melds = []
+        while line != "":
+            melds.append([Deck.strCardMap[cardStr] for cardStr in line.split(" ")])
+            line = self.readLine()
+        return melds
+
+    # Read the binary reply to getFinalMelds (see BinaryProtocol.encodeMelds).
+    # @return list of melds, or None
+    def readBinaryMelds(self):
+        numMelds = self.readByte()
+        if numMelds == BinaryProtocol.NONE:
+            return None
+        return [[Deck.allCards[cardId] for cardId in self.readBytes(self.readByte())] for _ in range(numMelds)]
+
+    def getFinalMelds(self):
+        if self.binary:
+            return self.request("getFinalMelds", bytes([BinaryProtocol.GET_FINAL_MELDS]), self.readBinaryMelds)
+        return self.request("getFinalMelds", "getFinalMelds", self.readMelds)
+
+    def reportFinalMelds(self, playerNum):
+        if self.binary:
+            self.notify(bytes([BinaryProtocol.REPORT_FINAL_MELDS, playerNum]))
+        else:
+            self.notify("reportFinalMelds %d" % playerNum)
+
+    # Wait until the server has processed every notification sent so far.
+    # @return number of notifications acknowledged by the sync
+    def sync(self):
+        if self.binary:
+            return struct.unpack(">I", self.request(None, bytes([BinaryProtocol.SYNC]), lambda: self.readBytes(4)))[0]
+        return int(self.request(None, "sync").split()[1])
+
+    # Ask the server whether it has warmed up.
+    # @return whether it is ready
+    def ready(self):
+        if self.binary:
+            return self.request(None, bytes([BinaryProtocol.READY]), self.readByte) == 1
+        return self.request(None, "ready") == "true"
+
+    # Poll "ready" until the server has warmed up.
+    # @param timeout seconds to wait at most
+    # @param interval seconds between polls
+    # @return whether the server became ready in time
+    def waitUntilReady(self, timeout=60.0, interval=0.1):
+        deadline = time.time() + timeout
+        while not self.ready():
+            if time.time() > deadline:
+                return False
+            time.sleep(interval)
+        return True
+
+    # Return the server's metrics (see ServerMetrics).
+    # @return map of the stats reply
+    def stats(self):
+        if self.binary:
+            return json.loads(self.request(None, bytes([BinaryProtocol.STATS]), self.readText))
+        return json.loads(self.request(None, "stats"))
+
+    def close(self):
+        try:
+            self.flush()
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
@@ -0,0 +1,147 @@
+# -------------------------------------------------------------------------------
+#  RemotePlayer
+#  GinRummyPlayer whose decisions are made by the player served by Server.py,
+#  so Python-side games and tournaments exercise the real served agent end to
+#  end, serving overhead included.
+#
+#  Every callback the protocol carries is forwarded over a ProtocolClient
+#  connection.  Notifications are not acknowledged and are held back until the
+#  next decision, so a turn costs one round trip per decision.  Connections are
+#  persistent and pooled per server: a player takes one from the pool at its
+#  first startGame and returns it with close(), and the next player reuses it.
+#
+#    player = RemotePlayer()
+#    GinRummyGame(SimpleGinRummyPlayer(), player).play()
+#    player.close()
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import argparse
+import threading
+import time
+from typing import List, TypeVar
+
+import numpy as np
+
+from GinRummyPlayer import GinRummyPlayer
+from ProtocolClient import ProtocolClient
+
+CardObj = TypeVar('Card')
+
+class ConnectionPool:
+
+    # Map from server address (host, port, unixPath) to idle connections.
+    idle = {}
+
+    # Guards idle.
+    lock = threading.Lock()
+
+    # Return an idle connection to the server, or a new one.
+    # @param host server host
+    # @param port server port
+    # @param unixPath unix domain socket path (used instead of host and port if given)
+    # @return ProtocolClient batching notifications
+    def acquire(host, port, unixPath=None):
+        with ConnectionPool.lock:
+            clients = ConnectionPool.idle.get((host, port, unixPath))
+            if clients:
+                return clients.pop()
+        return ProtocolClient(host, port, unixPath, batchNotifications=True)
+
+    # Return a connection to the pool.
+    # @param client connection taken with acquire
+    def release(client):
+        with ConnectionPool.lock:
+            ConnectionPool.idle.setdefault(client.address, []).append(client)
+
+    # Close every idle connection.
+    def closeAll():
+        with ConnectionPool.lock:
+            for clients in ConnectionPool.idle.values():
+                for client in clients:
+                    client.close()
+            ConnectionPool.idle.clear()
+
+class RemotePlayer(GinRummyPlayer):
+
+    # @param host server host
+    # @param port server port
+    # @param unixPath unix domain socket path (used instead of host and port if given)
+    def __init__(self, host='localhost', port=41869, unixPath=None):
+        self.address = (host, port, unixPath)
+        self.client = None
+
+    # Return the connection to the pool.  The player may be used again afterwards.
+    def close(self):
+        if self.client is not None:
+            ConnectionPool.release(self.client)
+            self.client = None
+
+    def startGame(self, playerNum: int, startingPlayerNum: int, cards: List[CardObj]) -> None:
+        if self.client is None:
+            self.client = ConnectionPool.acquire(*self.address)
+        self.client.startGame(playerNum, startingPlayerNum, cards)
+
+    def willDrawFaceUpCard(self, card: CardObj) -> bool:
+        return self.client.willDrawFaceUpCard(card)
+
+    def reportDraw(self, playerNum: int, drawnCard: CardObj) -> None:
+        self.client.reportDraw(playerNum, drawnCard)
+
+    def getDiscard(self) -> CardObj:
+        return self.client.getDiscard()
+
+    def reportDiscard(self, playerNum: int, discardedCard: CardObj) -> None:
+        self.client.reportDiscard(playerNum, discardedCard)
+
+    def getFinalMelds(self) -> List[List[CardObj]]:
+        return self.client.getFinalMelds()
+
+    def reportFinalMelds(self, playerNum: int, melds: List[List[CardObj]]) -> None:
+        # The protocol only carries the player number.
+        self.client.reportFinalMelds(playerNum)
+
+if __name__ == "__main__":
+    from GinRummyGame import GinRummyGame
+    from SimpleGinRummyPlayer import SimpleGinRummyPlayer
+
+    parser = argparse.ArgumentParser(description='Play SimpleGinRummyPlayer against the player served by Server.py.')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=41869)
+    parser.add_argument('--unix-path', default=None)
+    parser.add_argument('--games', type=int, default=100)
+    args = parser.parse_args()
+
+    player = RemotePlayer(args.host, args.port, args.unix_path)
+    game = GinRummyGame(SimpleGinRummyPlayer(), player)
+    numP1Wins = 0
+    startMs = int(round(time.time() * 1000))
+    for i in range(args.games):
+        numP1Wins += game.play()
+    totalMs = int(round(time.time() * 1000)) - startMs
+    print("%d games played in %d ms.\n" % (args.games, totalMs))
+    print("Games Won: P0:%d, P1:%d.\n" % (args.games - numP1Wins, numP1Wins))
+    for command, latencies in player.client.latencies.items():
+        latencies = np.array(latencies) * 1000
+        print("%-20s %8d round trips, p50 %.3f ms, p99 %.3f ms" % (command, len(latencies), np.percentile(latencies, 50), np.percentile(latencies, 99)))
+    player.close()
+    ConnectionPool.closeAll()
@@ -0,0 +1,244 @@
+# -------------------------------------------------------------------------------
+#  ResultsStore
+#  SQLite store of game results, replacing the CSVs and text dumps written
+#  from inside the game loops.
+#
+#  A run (one sweep or tournament) has many matches (games to GOAL_SCORE),
+#  each with the scores after every round (hand) and, for sweeps, the parameter
+#  point the player was configured with.  Pairs of agents are stored sorted
+#  (agent_a < agent_b) with the agent of seat 0 and the winner by name, so
+#  win rates by parameter, by agent pair and by seed are plain indexed queries:
+#
+#    $ python3 ResultsStore.py results.sqlite --by parameter --agent ohe
+#    $ python3 ResultsStore.py results.sqlite --by pair
+#
+#  Worker processes never open the database.  start creates the run and a
+#  single writer process; recordGame puts a game on the writer's queue, and the
+#  writer inserts whatever has arrived in one transaction per batch, in WAL
+#  mode.  Call start before forking the workers, so they inherit the queue, and
+#  stop at the end to flush it.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import argparse
+import json
+import multiprocessing
+import queue
+import sqlite3
+import time
+
+class ResultsStore:
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            started REAL NOT NULL,
+            args TEXT
+        );
+        CREATE TABLE IF NOT EXISTS points (
+            id INTEGER PRIMARY KEY,
+            run_id INTEGER NOT NULL REFERENCES runs(id),
+            key TEXT NOT NULL,
+            UNIQUE (run_id, key)
+        );
+        CREATE TABLE IF NOT EXISTS point_values (
+            point_id INTEGER NOT NULL REFERENCES points(id),
+            name TEXT NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (point_id, name)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS matches (
+            id INTEGER PRIMARY KEY,
+            run_id INTEGER NOT NULL REFERENCES runs(id),
+            point_id INTEGER REFERENCES points(id),
+            agent_a TEXT NOT NULL,
+            agent_b TEXT NOT NULL,
+            seat0 TEXT NOT NULL,
+            winner TEXT NOT NULL,
+            seed TEXT,
+            score0 INTEGER NOT NULL,
+            score1 INTEGER NOT NULL,
+            seconds REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS rounds (
+            match_id INTEGER NOT NULL REFERENCES matches(id),
+            number INTEGER NOT NULL,
+            score0 INTEGER NOT NULL,
+            score1 INTEGER NOT NULL,
+            PRIMARY KEY (match_id, number)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS point_values_by_name ON point_values (name, value);
+        CREATE INDEX IF NOT EXISTS matches_by_run ON matches (run_id);
+        CREATE INDEX IF NOT EXISTS matches_by_point ON matches (point_id);
+        CREATE INDEX IF NOT EXISTS matches_by_pair ON matches (agent_a, agent_b);
+        CREATE INDEX IF NOT EXISTS matches_by_seed ON matches (seed);
+    """
+
+    # Most games the writer inserts in one transaction, and seconds it waits to fill a batch.
+    BATCH_SIZE = 500
+    BATCH_SECONDS = 0.5
+
+    # Queue to the writer process, the writer, and the current run (None when not started).
+    queue = None
+    writer = None
+    runId = None
+
+    # Open a store, creating its tables if needed.
+    # @param path SQLite database file
+    # @return sqlite3 connection
+    def connect(path):
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(ResultsStore.SCHEMA)
+        return conn
+
+    # Create a run and start the writer process.
+    # @param path SQLite database file
+    # @param kind kind of run, e.g. "sweep" or "tournament"
+    # @param args map of the run's settings, stored as JSON
+    # @return id of the new run
+    def start(path, kind, args=None):
+        conn = ResultsStore.connect(path)
+        with conn:
+            ResultsStore.runId = conn.execute("INSERT INTO runs (kind, started, args) VALUES (?, ?, ?)",
+                (kind, time.time(), json.dumps(args))).lastrowid
+        conn.close()
+
+        context = multiprocessing.get_context("fork")
+        ResultsStore.queue = context.Queue()
+        ResultsStore.writer = context.Process(target=ResultsStore._writerMain, args=(path, ResultsStore.queue), name="ResultsWriter")
+        ResultsStore.writer.start()
+        return ResultsStore.runId
+
+    # Send a finished game to the writer (from any process forked after start).  Does nothing if not started.
+    # @param game GinRummyGame that has just played the game
+    # @param agents names of the agents in seat 0 and seat 1
+    # @param winner winning seat 0 or 1
+    # @param seconds seconds the game took
+    # @param seed deal seed passed to play (None if unseeded)
+    # @param point list of (name, value) pairs the configured player used (None if none)
+    def recordGame(game, agents, winner, seconds, seed=None, point=None):
+        if ResultsStore.queue is not None:
+            ResultsStore.queue.put((ResultsStore.runId, point, tuple(agents), winner, seed, game.roundScores, seconds))
+
+    # Flush the queue and stop the writer.
+    def stop():
+        if ResultsStore.writer is not None:
+            ResultsStore.queue.put(None)
+            ResultsStore.writer.join()
+            ResultsStore.queue = None
+            ResultsStore.writer = None
+
+    # Insert one game.
+    # @param conn sqlite3 connection inside a transaction
+    # @param pointIds map from (run id, point key) to point id, filled as points are inserted
+    # @param record tuple put by recordGame
+    def _insert(conn, pointIds, record):
+        runId, point, agents, winner, seed, roundScores, seconds = record
+        pointId = None
+        if point is not None:
+            key = ",".join("%s=%r" % entry for entry in point)
+            pointId = pointIds.get((runId, key))
+            if pointId is None:
+                conn.execute("INSERT OR IGNORE INTO points (run_id, key) VALUES (?, ?)", (runId, key))
+                pointId = conn.execute("SELECT id FROM points WHERE run_id = ? AND key = ?", (runId, key)).fetchone()[0]
+                conn.executemany("INSERT OR IGNORE INTO point_values (point_id, name, value) VALUES (?, ?, ?)",
+                    [(pointId, name, value) for name, value in point])
+                pointIds[runId, key] = pointId
+
+        scores = roundScores[-1] if roundScores else [0, 0]
+        matchId = conn.execute("INSERT INTO matches (run_id, point_id, agent_a, agent_b, seat0, winner, seed, score0, score1, seconds)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (runId, pointId, min(agents), max(agents), agents[0], agents[winner],
+            seed, scores[0], scores[1], seconds)).lastrowid
+        conn.executemany("INSERT INTO rounds (match_id, number, score0, score1) VALUES (?, ?, ?, ?)",
+            [(matchId, number, score0, score1) for number, (score0, score1) in enumerate(roundScores)])
+
+    # Insert the queued games in batches until stop (in the writer process).
+    # @param path SQLite database file
+    # @param records queue of recordGame tuples, ended by None
+    def _writerMain(path, records):
+        conn = ResultsStore.connect(path)
+        pointIds = {}
+        stopped = False
+        while not stopped:
+            batch = [records.get()]
+            deadline = time.time() + ResultsStore.BATCH_SECONDS
+            while batch[-1] is not None and len(batch) < ResultsStore.BATCH_SIZE:
+                try:
+                    batch.append(records.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                stopped = True
+                batch.pop()
+            with conn:
+                for record in batch:
+                    ResultsStore._insert(conn, pointIds, record)
+        conn.close()
+
+    # Return the win rate of an agent at every value of a parameter.
+    # @param conn sqlite3 connection
+    # @param agent agent whose wins are counted
+    # @param name parameter name (every parameter if None)
+    # @return list of (name, value, games, win rate)
+    def winRateByParameter(conn, agent, name=None):
+        where, parameters = ("", (agent,)) if name is None else (" WHERE v.name = ?", (agent, name))
+        return conn.execute("SELECT v.name, v.value, COUNT(*), AVG(m.winner = ?) FROM point_values v"
+            " JOIN matches m ON m.point_id = v.point_id" + where +
+            " GROUP BY v.name, v.value ORDER BY v.name, v.value", parameters).fetchall()
+
+    # Return the win rate of the first agent of every agent pair.
+    # @param conn sqlite3 connection
+    # @return list of (agent a, agent b, games, win rate of agent a)
+    def winRateByPair(conn):
+        return conn.execute("SELECT agent_a, agent_b, COUNT(*), AVG(winner = agent_a) FROM matches"
+            " GROUP BY agent_a, agent_b ORDER BY agent_a, agent_b").fetchall()
+
+    # Return the win rate of an agent on every seeded deal.
+    # @param conn sqlite3 connection
+    # @param agent agent whose wins are counted
+    # @return list of (seed, games, win rate)
+    def winRateBySeed(conn, agent):
+        return conn.execute("SELECT seed, COUNT(*), AVG(winner = ?) FROM matches WHERE seed IS NOT NULL"
+            " AND (agent_a = ? OR agent_b = ?) GROUP BY seed ORDER BY seed", (agent, agent, agent)).fetchall()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Query a results store.')
+    parser.add_argument('path', help='SQLite database file')
+    parser.add_argument('--by', choices=['parameter', 'pair', 'seed'], default='pair')
+    parser.add_argument('--agent', default='ohe', help='agent whose win rate is reported (by parameter and seed)')
+    parser.add_argument('--param', default=None, help='parameter to report (every parameter if not given)')
+    args = parser.parse_args()
+
+    conn = ResultsStore.connect(args.path)
+    if args.by == 'parameter':
+        for name, value, games, rate in ResultsStore.winRateByParameter(conn, args.agent, args.param):
+            print("%-15s %10.4g %8d %8.4f" % (name, value, games, rate))
+    elif args.by == 'pair':
+        for agentA, agentB, games, rate in ResultsStore.winRateByPair(conn):
+            print("%-10s %-10s %8d %8.4f" % (agentA, agentB, games, rate))
+    else:
+        for seed, games, rate in ResultsStore.winRateBySeed(conn, args.agent):
+            print("%-20s %8d %8.4f" % (seed, games, rate))
+    conn.close()
@@ -0,0 +1,78 @@
+# -------------------------------------------------------------------------------
+#  SequentialTest
+#  Wald's sequential probability ratio test on the running win count of a
+#  head-to-head match, so a benchmark stops as soon as it is clear which player
+#  is stronger instead of always playing a fixed number of games.
+#
+#  The test weighs "player 1 wins with probability 1/2 + delta" against "player
+#  1 wins with probability 1/2 - delta".  After every game it adds the log
+#  likelihood ratio of the outcome and stops once the sum leaves
+#  (log(errorRate / (1 - errorRate)), log((1 - errorRate) / errorRate)), which
+#  keeps the chance of naming the weaker player the stronger one below
+#  errorRate whenever the true win rate is at least delta away from 1/2.
+#  Closer matches take longer and are cut off at the maximum number of games
+#  as undecided.
+#
+#    test = SequentialTest(delta=0.05, errorRate=0.05)
+#    while test.decision() is None and test.games < 1000:
+#        test.update(game.play())
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import math
+
+class SequentialTest:
+
+    # @param delta distance of the win rate from 1/2 that must be detected
+    # @param errorRate probability of naming the wrong player at that distance
+    def __init__(self, delta=0.05, errorRate=0.05):
+        if not 0 < delta < 0.5:
+            raise ValueError("delta must be between 0 and 0.5")
+        if not 0 < errorRate < 0.5:
+            raise ValueError("errorRate must be between 0 and 0.5")
+        self.delta = delta
+        self.errorRate = errorRate
+        self.winStep = math.log((0.5 + delta) / (0.5 - delta))
+        self.upperBound = math.log((1 - errorRate) / errorRate)
+        self.games = 0
+        self.wins = 0
+        self.llr = 0.0
+
+    # Record the outcome of a game.
+    # @param win 1 if player 1 won the game, 0 if player 0 won it
+    # @return decision() after the game
+    def update(self, win):
+        self.games += 1
+        self.wins += win
+        # The test is symmetric: a win adds winStep and a loss subtracts it.
+        self.llr += self.winStep if win else -self.winStep
+        return self.decision()
+
+    # Return the player found stronger, if any.
+    # @return 1 or 0 for the stronger player, or None while undecided
+    def decision(self):
+        if self.llr >= self.upperBound:
+            return 1
+        if self.llr <= -self.upperBound:
+            return 0
+        return None
+
@@ -1,48 +1,189 @@
-import socket
-import sys
+import argparse
+import asyncio
+import random
+import signal
+import threading
 
+from Deck import Deck
+from ModelRegistry import ModelRegistry
+from ServerMetrics import ServerMetrics
+from ServerSession import ServerSession
+from SharedMemoryTransport import serveSharedMemory
 from SocketPlayer import SocketPlayer
+from WorkerPool import WorkerPool
 
 ########
 verbose = False
-player = SocketPlayer()
+host = 'localhost'
+port = 41869
+maxConnections = 64
+transport = 'tcp'
+unixPath = '/tmp/ginrummy.sock'
+shmName = 'ginrummy'
+shmSlots = 4
+workers = 0
+metricsFile = None
+metricsInterval = 10.0
+warmupDecisions = 50
 ########
 
-# Create a TCP/IP socket
-sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+# Number of connections currently being served.
+activeConnections = 0
 
-# Bind the socket to the port
-server_address = ('localhost', 41869)
-print('Starting up server on %s port %s' % server_address)
-sock.bind(server_address)
+# Set to stop serving shared memory channels.
+stopping = threading.Event()
 
-# Listen for incoming connections
-sock.listen(1)
+# Worker processes running the sessions, if any (see WorkerPool).
+pool = None
 
-while True:
-    # Wait for a connection
-    if SocketPlayer.verbose:
-        print('Waiting for a connection')
-    connection, client_address = sock.accept()
+# Serve one client connection with its own SocketPlayer session.  All sessions
+# share the model loaded once through ModelRegistry.
+async def handleConnection(reader, writer):
+    global activeConnections
+    client_address = writer.get_extra_info('peername')
 
+    if activeConnections >= maxConnections:
+        print('Refusing connection from %s: %d connections already open' % (client_address, activeConnections))
+        writer.close()
+        return
+
+    activeConnections += 1
+    if pool is not None:
+        key = pool.open()
+    else:
+        session = ServerSession()
     try:
         if SocketPlayer.verbose:
             print('Connection from', client_address)
 
-        # Receive the data in small chunks and retransmit it
+        # Receive the data in chunks; the session frames it into commands.
         while True:
-            dataBytes = connection.recv(1600)
-            dataStr = dataBytes.decode("ascii")
+            dataBytes = await reader.read(4096)
             if verbose:
-                print('Received "%s"' % dataStr)
-            if dataStr:
-                res = player.interpretSocketOutput(dataStr)
-                connection.sendall(res)
+                print('Received "%s"' % dataBytes.decode("ascii", "replace"))
+            if dataBytes:
+                if pool is not None:
+                    res = await pool.feed(key, dataBytes)
+                else:
+                    try:
+                        res = session.feed(dataBytes)
+                    except Exception as e:
+                        # Any failure of the session drops the connection, as in a worker (see WorkerPool).
+                        raise ValueError("%s: %s" % (type(e).__name__, e)) from e
+                if res:
+                    writer.write(res)
+                    await writer.drain()
             else:
                 if SocketPlayer.verbose:
                     print('No more data from', client_address)
                 break
+    except ConnectionError:
+        if SocketPlayer.verbose:
+            print('Connection to %s lost' % (client_address,))
+    except ValueError as e:
+        print('Dropping connection from %s: %s' % (client_address, e))
 
     finally:
         # Clean up the connection
-        connection.close()
+        activeConnections -= 1
+        if pool is not None:
+            pool.close(key)
+        else:
+            session.close()
+        writer.close()
+
+# Load the model and play synthetic games so that the first real decisions find
+# the model, the meld tables and the interpreter's caches warm, then report the
+# server ready.  The games bypass ServerSession, so they do not show in ServerMetrics.
+# @param numDecisions number of synthetic getDiscard decisions
+def warmUp(numDecisions):
+    ModelRegistry.preload()
+    rng = random.Random(0)
+    player = SocketPlayer()
+    decisions = 0
+    while decisions < numDecisions:
+        deck = list(Deck.allCards)
+        rng.shuffle(deck)
+        player.interpretSocketOutput("startGame 0 0 " + " ".join(str(card) for card in deck[:10]))
+        # Take every face-up card and discard again, for up to 10 turns.
+        for card in deck[10:20]:
+            player.interpretSocketOutput("willDrawFaceUpCard %s" % card)
+            player.interpretSocketOutput("reportDraw 0 %s" % card)
+            discard = player.interpretSocketOutput("getDiscard").decode("ascii").strip()
+            player.interpretSocketOutput("reportDiscard 0 %s" % discard)
+            player.interpretSocketOutput("getFinalMelds")
+            decisions += 1
+            if decisions >= numDecisions:
+                break
+    ServerSession.ready = True
+
+async def main():
+    # Every transport feeds the bytes of a client into its own ServerSession.
+    if transport == 'shm':
+        warmUp(warmupDecisions)
+        print('Starting up server on shared memory channels %s-0 to %s-%d' % (shmName, shmName, shmSlots - 1))
+        # Unlink the channels on SIGTERM as well as on Ctrl-C.
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, ModelRegistry.reloadInBackground)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, serveSharedMemory, shmName, shmSlots, ServerSession, stopping.is_set)
+        finally:
+            stopping.set()
+        return
+
+    if transport == 'unix':
+        server = await asyncio.start_unix_server(handleConnection, unixPath)
+        print('Starting up server on unix socket %s' % unixPath)
+    else:
+        server = await asyncio.start_server(handleConnection, host, port)
+        print('Starting up server on %s port %s' % (host, port))
+    # SIGHUP reloads the default model without dropping games in progress.
+    if pool is not None:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, pool.signalWorkers, signal.SIGHUP)
+    else:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, ModelRegistry.reloadInBackground)
+    if not ServerSession.ready:
+        # Clients may already connect and poll "ready" while the server warms up.
+        await asyncio.get_running_loop().run_in_executor(None, warmUp, warmupDecisions)
+        print('Server ready')
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve SocketPlayer sessions to PrincetonGinPlayer clients.')
+    parser.add_argument('--host', default=host)
+    parser.add_argument('--port', type=int, default=port)
+    parser.add_argument('--max-connections', type=int, default=maxConnections, help='connections served at once; further ones are refused')
+    parser.add_argument('--transport', choices=['tcp', 'unix', 'shm'], default=transport, help='tcp (default), unix domain socket or shared memory')
+    parser.add_argument('--unix-path', default=unixPath, help='socket path for the unix transport')
+    parser.add_argument('--shm-name', default=shmName, help='base channel name for the shm transport')
+    parser.add_argument('--shm-slots', type=int, default=shmSlots, help='number of shared memory channels (concurrent clients)')
+    parser.add_argument('--workers', type=int, default=workers, help='worker processes running the sessions, each connection on one worker (0 serves them in the server process)')
+    parser.add_argument('--metrics-file', default=metricsFile, help='file to dump server metrics to periodically (per worker with --workers)')
+    parser.add_argument('--metrics-interval', type=float, default=metricsInterval, help='seconds between metrics dumps')
+    parser.add_argument('--warmup-decisions', type=int, default=warmupDecisions, help='synthetic decisions played at startup before reporting ready')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    if args.workers > 0 and args.transport == 'shm':
+        parser.error('--workers is not supported with the shm transport')
+    host, port, maxConnections = args.host, args.port, args.max_connections
+    transport, unixPath, shmName, shmSlots = args.transport, args.unix_path, args.shm_name, args.shm_slots
+    verbose = SocketPlayer.verbose = args.verbose
+    metricsFile, metricsInterval = args.metrics_file, args.metrics_interval
+    warmupDecisions = args.warmup_decisions
+
+    if args.workers > 0:
+        # Warm up before forking so the workers share the loaded model copy-on-write.
+        warmUp(warmupDecisions)
+        pool = WorkerPool(args.workers, metricsFile, metricsInterval)
+        print('Started %d worker processes' % args.workers)
+    elif metricsFile is not None:
+        ServerMetrics.startDump(metricsFile, metricsInterval)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pool is not None:
+            pool.shutdown()
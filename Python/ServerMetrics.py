@@ -0,0 +1,180 @@
+# -------------------------------------------------------------------------------
+#  ServerMetrics
+#  Process-wide counters and latency histograms of the player server.
+#
+#  ServerSession records every command it executes: a count per command, a
+#  latency histogram per command, and for decisions the time spent in the
+#  opponent hand model (inference) apart from the rest of the decision (the meld
+#  engine).  It also tracks open sessions and the bytes read and written.
+#
+#  Recording only increments counters, so it stays on in production.  Latency
+#  histograms have log-spaced buckets 25% apart, which bounds the error of the
+#  reported percentiles.  Clients read a snapshot with the "stats" command, and
+#  startDump writes one to a file periodically.
+#
+#  Metrics are per process: with Server.py --workers each worker keeps its own,
+#  and a snapshot names its worker, so a stats reply only covers the connections
+#  of the worker serving it.  Only the game commands in COMMANDS are counted.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import bisect
+import json
+import os
+import threading
+import time
+
+class ServerMetrics:
+
+    # Upper bounds of the latency histogram buckets in microseconds (10us to about 10s).
+    # Latencies above the last bound fall into one more overflow bucket.
+    BUCKET_BOUNDS = [10 * 1.25 ** i for i in range(63)]
+
+    # Percentiles reported per command.
+    PERCENTILES = [50, 95, 99]
+
+    # Commands recorded; anything else a client sends is not counted.
+    COMMANDS = ["startGame", "willDrawFaceUpCard", "reportDraw", "getDiscard", "reportDiscard", "getFinalMelds", "reportFinalMelds"]
+
+    # Index of the worker process keeping these metrics (None in a server without workers).
+    worker = None
+
+    # Map from command to number of times it was executed.
+    counts = {}
+
+    # Map from command to latency histogram (counts per bucket).
+    histograms = {}
+
+    # Commands that are decisions, whose time is split into inference and meld engine.
+    DECISIONS = {"willDrawFaceUpCard", "getDiscard", "getFinalMelds"}
+
+    # Seconds decisions spent in the opponent hand model, and in everything else.
+    inferenceSeconds = 0.0
+    meldSeconds = 0.0
+
+    # Sessions currently open (connections, plus multiplexed games).
+    activeSessions = 0
+
+    # Bytes read from and written to clients.
+    bytesIn = 0
+    bytesOut = 0
+
+    # When counting started.
+    startTime = time.time()
+
+    # Record one executed command.
+    # @param command command name
+    # @param seconds time taken to execute it
+    # @param inferenceSeconds part of that time spent in the opponent hand model (used for decisions only)
+    def recordCommand(command, seconds, inferenceSeconds=0.0):
+        if command not in ServerMetrics.COMMANDS:
+            return
+        ServerMetrics.counts[command] = ServerMetrics.counts.get(command, 0) + 1
+        histogram = ServerMetrics.histograms.get(command)
+        if histogram is None:
+            histogram = ServerMetrics.histograms[command] = [0] * (len(ServerMetrics.BUCKET_BOUNDS) + 1)
+        histogram[bisect.bisect_left(ServerMetrics.BUCKET_BOUNDS, seconds * 1e6)] += 1
+        if command in ServerMetrics.DECISIONS:
+            ServerMetrics.inferenceSeconds += inferenceSeconds
+            ServerMetrics.meldSeconds += seconds - inferenceSeconds
+
+    # Record bytes read from and written to a client.
+    # @param bytesIn bytes read
+    # @param bytesOut bytes written
+    def recordBytes(bytesIn, bytesOut):
+        ServerMetrics.bytesIn += bytesIn
+        ServerMetrics.bytesOut += bytesOut
+
+    # Record sessions opening (positive) or closing (negative).
+    # @param count change in the number of open sessions
+    def recordSessions(count):
+        ServerMetrics.activeSessions += count
+
+    # Return a percentile of a latency histogram, as the upper bound of its bucket.
+    # @param histogram counts per bucket
+    # @param percentile percentile (0 - 100)
+    # @return latency in microseconds (infinity in the overflow bucket, None if empty)
+    def percentile(histogram, percentile):
+        total = sum(histogram)
+        if total == 0:
+            return None
+        rank = percentile / 100 * total
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if seen >= rank and count > 0:
+                return ServerMetrics.BUCKET_BOUNDS[bucket] if bucket < len(ServerMetrics.BUCKET_BOUNDS) else float("inf")
+        return float("inf")
+
+    # Return all metrics.
+    # @return JSON-serializable map of the metrics
+    def snapshot():
+        latencies = {}
+        for command, histogram in list(ServerMetrics.histograms.items()):
+            latencies[command] = {"p%d" % p: ServerMetrics.percentile(histogram, p) for p in ServerMetrics.PERCENTILES}
+        return {
+            "pid": os.getpid(),
+            "worker": ServerMetrics.worker,
+            "uptimeSeconds": time.time() - ServerMetrics.startTime,
+            "activeSessions": ServerMetrics.activeSessions,
+            "bytesIn": ServerMetrics.bytesIn,
+            "bytesOut": ServerMetrics.bytesOut,
+            "counts": dict(ServerMetrics.counts),
+            "latencyMicroseconds": latencies,
+            "inferenceSeconds": ServerMetrics.inferenceSeconds,
+            "meldSeconds": ServerMetrics.meldSeconds,
+        }
+
+    # Reset all metrics, e.g. in a freshly forked worker.
+    def reset():
+        ServerMetrics.counts = {}
+        ServerMetrics.histograms = {}
+        ServerMetrics.inferenceSeconds = 0.0
+        ServerMetrics.meldSeconds = 0.0
+        ServerMetrics.activeSessions = 0
+        ServerMetrics.bytesIn = 0
+        ServerMetrics.bytesOut = 0
+        ServerMetrics.startTime = time.time()
+
+    # Write a snapshot to a file, replacing it atomically.
+    # @param path file to write
+    def dump(path):
+        tmpPath = path + ".tmp"
+        with open(tmpPath, "w") as f:
+            json.dump(ServerMetrics.snapshot(), f, indent=1)
+        os.replace(tmpPath, path)
+
+    # Start a daemon thread dumping a snapshot to a file every interval seconds.
+    # @param path file to write
+    # @param interval seconds between dumps
+    # @return the started thread
+    def startDump(path, interval):
+        def dumpLoop():
+            while True:
+                time.sleep(interval)
+                try:
+                    ServerMetrics.dump(path)
+                except OSError as e:
+                    print('Could not write metrics to %s: %s' % (path, e))
+        thread = threading.Thread(target=dumpLoop, name="ServerMetricsDump", daemon=True)
+        thread.start()
+        return thread
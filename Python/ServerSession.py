@@ -0,0 +1,319 @@
+# -------------------------------------------------------------------------------
+#  ServerSession
+#  Turns the byte stream of one client connection into SocketPlayer commands.
+#
+#  Commands are newline-terminated lines.  Bytes are buffered until a full line
+#  has arrived, and every complete line in a read is executed in order, so a
+#  client may pipeline several commands (e.g. reportDraw and reportDiscard)
+#  without waiting for each reply.  The replies of all commands completed by one
+#  read are returned together, in command order.
+#
+#  A client may request protocol options with "hello <option> ...", answered by
+#  "hello" followed by the options the server accepted.  With the noack option
+#  the notifications (startGame, reportDraw, reportDiscard, reportFinalMelds) get
+#  no reply at all; only the decisions willDrawFaceUpCard, getDiscard and
+#  getFinalMelds are round trips.  "sync" then acknowledges all notifications
+#  since the previous sync in one reply, "ok <count>".
+#
+#  With the binary option every byte after the hello line uses the compact
+#  framing of BinaryProtocol instead of text lines.
+#
+#  With the mux option one connection carries many independent games.  Every
+#  text command is then prefixed with "@<session id> " (e.g. "@7 getDiscard"),
+#  and every binary request carries a 2-byte big-endian session id right after
+#  its opcode.  A session id gets its own SocketPlayer with its startGame;
+#  replies are unchanged and come back in command order.  Sessions idle for
+#  longer than IDLE_TIMEOUT seconds are closed, and a startGame opening a new
+#  session once MAX_SESSIONS are open is refused.  hello and sync apply to the
+#  whole connection.
+#
+#  A failing command of a multiplexed game (a bad card, or a session that is
+#  closed or was never started) ends that session only: the command is answered
+#  with "error <message>" (binary: the byte BinaryProtocol.ERROR) unless it is a
+#  notification under noack, and the other games of the connection go on.
+#
+#  "stats" replies with a single line of JSON holding the ServerMetrics of the
+#  process serving the connection: the server, or with --workers the worker
+#  named in its "worker" entry.  "ping" replies "pong", and "ready" replies "true" once the
+#  server has warmed up (see Server.warmUp) and "false" before, so a client can
+#  poll it before starting a match.
+#
+#  "reload" loads the model directory afresh in the background and switches new
+#  games of this server process to it once it passed a smoke prediction (see
+#  ModelRegistry.reload); it replies "reloading" at once.  The outcome shows in
+#  the "model" entry of stats.  It takes no path, so a client cannot make the
+#  server load a file of its choosing.
+#
+#  Older clients send each command without a terminating newline and wait for
+#  the reply before sending the next one.  Newline framed clients always open
+#  with a hello (PrincetonGinPlayer does, with or without options), so the first
+#  bytes of a connection decide: a connection starting with "hello" uses newline
+#  framing, any other is a legacy client, each read being one command.  Bytes
+#  are buffered until they tell, however the first command is split into reads.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import json
+import struct
+import time
+from collections import OrderedDict
+
+from BinaryProtocol import BinaryProtocol
+from ModelRegistry import ModelRegistry
+from ServerMetrics import ServerMetrics
+from SocketPlayer import SocketPlayer
+
+class ServerSession:
+
+    # Framing modes.
+    UNDETERMINED = 0
+    LEGACY = 1
+    LINES = 2
+    BINARY = 3
+
+    # Commands that only inform the player of the game.
+    NOTIFICATIONS = ["startGame", "reportDraw", "reportDiscard", "reportFinalMelds"]
+
+    # Protocol options a client may request with hello.
+    OPTIONS = ["noack", "binary", "mux"]
+
+    # Seconds a multiplexed session may stay idle, and the most sessions per connection.
+    IDLE_TIMEOUT = 600.0
+    MAX_SESSIONS = 1024
+
+    # Longest command line accepted before the connection is considered broken.
+    MAX_LINE_BYTES = 4096
+
+    # Whether the server has finished warming up.
+    ready = False
+
+    # @param player SocketPlayer executing the commands (a new one if None)
+    def __init__(self, player=None):
+        self.player = player if player is not None else SocketPlayer()
+        self.mode = ServerSession.UNDETERMINED
+        self.buffer = b""
+
+        # Whether notifications are acknowledged, and how many were not since the last sync.
+        self.noAck = False
+        self.unacknowledged = 0
+
+        # Multiplexed sessions: map from session id to player, least recently used first.
+        self.mux = False
+        self.sessions = OrderedDict()
+        self.lastUsed = {}
+        ServerMetrics.recordSessions(1)
+
+    # Release the session once its connection is closed.
+    def close(self):
+        ServerMetrics.recordSessions(-1 - len(self.sessions))
+        self.sessions.clear()
+        self.lastUsed.clear()
+
+    # Consume bytes read from the connection.
+    # @param data bytes read from the connection
+    # @return reply bytes to send back (possibly empty)
+    def feed(self, data):
+        bytesIn = len(data)
+        if self.mode == ServerSession.UNDETERMINED:
+            self.buffer += data
+            if self.buffer.startswith(b"hello"):
+                self.mode = ServerSession.LINES
+            elif b"hello".startswith(self.buffer):
+                # Possibly the start of a hello split over reads.
+                ServerMetrics.recordBytes(bytesIn, 0)
+                return b""
+            else:
+                self.mode = ServerSession.LEGACY
+            data, self.buffer = self.buffer, b""
+
+        if self.mode == ServerSession.LEGACY:
+            res = self.execute(data.decode("ascii").strip())
+            ServerMetrics.recordBytes(bytesIn, len(res))
+            return res
+
+        self.buffer += data
+        replies = []
+        while True:
+            if self.mode == ServerSession.BINARY:
+                frameBuffer = self.buffer
+                if self.mux:
+                    if len(self.buffer) < 3:
+                        break
+                    # Move the session id out from between opcode and operands.
+                    frameBuffer = self.buffer[:1] + self.buffer[3:]
+                frame = BinaryProtocol.parse(frameBuffer)
+                if frame is None:
+                    break
+                opcode, operands, consumed = frame
+                sessionId = None
+                if self.mux:
+                    sessionId = struct.unpack_from(">H", self.buffer, 1)[0]
+                    consumed += 2
+                self.buffer = self.buffer[consumed:]
+                replies.append(self.executeBinary(opcode, operands, sessionId))
+                continue
+
+            end = self.buffer.find(b"\n")
+            if end < 0:
+                break
+            line = self.buffer[:end].decode("ascii").strip()
+            self.buffer = self.buffer[end + 1:]
+            if line:
+                replies.append(self.execute(line))
+        if len(self.buffer) > ServerSession.MAX_LINE_BYTES:
+            raise ValueError("command line longer than %d bytes" % ServerSession.MAX_LINE_BYTES)
+        res = b"".join(replies)
+        ServerMetrics.recordBytes(bytesIn, len(res))
+        return res
+
+    # Execute a single command line.
+    # @param line command line without its terminating newline
+    # @return reply bytes
+    def execute(self, line):
+        if not line:
+            return b""
+        dataArgs = line.split(" ")
+
+        # Session id of a multiplexed command.
+        sessionId = None
+        if self.mux and dataArgs[0].startswith("@") and len(dataArgs) > 1:
+            sessionId = dataArgs[0][1:]
+            dataArgs = dataArgs[1:]
+            line = " ".join(dataArgs)
+
+        if dataArgs[0] == "hello":
+            accepted = [option for option in dataArgs[1:] if option in ServerSession.OPTIONS]
+            self.noAck = "noack" in accepted
+            self.mux = "mux" in accepted
+            if "binary" in accepted:
+                self.mode = ServerSession.BINARY
+            return bytes(" ".join(["hello"] + accepted) + "\n", "ascii")
+
+        if dataArgs[0] == "sync":
+            count = self.unacknowledged
+            self.unacknowledged = 0
+            return bytes("ok %d\n" % count, "ascii")
+
+        if dataArgs[0] == "stats":
+            return bytes(ServerSession.statsJson() + "\n", "ascii")
+
+        if dataArgs[0] == "reload":
+            if len(dataArgs) > 1:
+                raise ValueError("reload takes no arguments: %s" % line)
+            ModelRegistry.reloadInBackground()
+            return b"reloading\n"
+
+        if dataArgs[0] == "ping":
+            return b"pong\n"
+
+        if dataArgs[0] == "ready":
+            return b"true\n" if ServerSession.ready else b"false\n"
+
+        if self.mux and sessionId is None:
+            raise ValueError("multiplexed command without session id: %s" % line)
+        return self.runCommand(sessionId, dataArgs[0], lambda player: player.interpretSocketOutput(line),
+            lambda message: bytes("error %s\n" % message, "ascii", "replace"))
+
+    # Run a game command on the player of the connection or of a multiplexed session.
+    # @param sessionId session id of a multiplexed command (None without mux)
+    # @param command command name
+    # @param run function executing the command on a player and returning its reply bytes
+    # @param errorReply function returning the reply to a failed multiplexed command from its message
+    # @return reply bytes (raises the failure without mux)
+    def runCommand(self, sessionId, command, run, errorReply):
+        try:
+            player = self.player if sessionId is None else self.sessionPlayer(sessionId, command)
+            startTime = time.perf_counter()
+            inferenceSeconds = player.inferenceSeconds
+            res = run(player)
+            ServerMetrics.recordCommand(command, time.perf_counter() - startTime, player.inferenceSeconds - inferenceSeconds)
+        except Exception as e:
+            if sessionId is None:
+                raise
+            # Only this game ends; the other games of the connection go on.
+            self.closeSession(sessionId)
+            res = errorReply("%s: %s" % (type(e).__name__, e))
+        if self.noAck and command in ServerSession.NOTIFICATIONS:
+            self.unacknowledged += 1
+            return b""
+        return res if res is not None else b""
+
+    # Return the server metrics and model status as JSON text.
+    # @return JSON text of the stats reply
+    def statsJson():
+        return json.dumps(dict(ServerMetrics.snapshot(), model=ModelRegistry.stats()))
+
+    # Return the player of a multiplexed session, opening the session with startGame.
+    # Also closes idle sessions.
+    # @param sessionId session id
+    # @param command name of the command for the session
+    # @return SocketPlayer of the session (raises ValueError for a command of a session
+    #         that is not open, or a new session beyond MAX_SESSIONS)
+    def sessionPlayer(self, sessionId, command):
+        now = time.monotonic()
+        while self.sessions:
+            oldest = next(iter(self.sessions))
+            if now - self.lastUsed[oldest] <= ServerSession.IDLE_TIMEOUT:
+                break
+            self.closeSession(oldest)
+
+        player = self.sessions.get(sessionId)
+        if player is None:
+            if command != "startGame":
+                raise ValueError("no game in progress in session %s" % sessionId)
+            if len(self.sessions) >= ServerSession.MAX_SESSIONS:
+                raise ValueError("%d sessions already open" % ServerSession.MAX_SESSIONS)
+            player = self.sessions[sessionId] = SocketPlayer()
+            ServerMetrics.recordSessions(1)
+        self.sessions.move_to_end(sessionId)
+        self.lastUsed[sessionId] = now
+        return player
+
+    # Close a multiplexed session, if open.
+    # @param sessionId session id
+    def closeSession(self, sessionId):
+        if self.sessions.pop(sessionId, None) is not None:
+            del self.lastUsed[sessionId]
+            ServerMetrics.recordSessions(-1)
+
+    # Execute a single binary request.
+    # @param opcode request opcode
+    # @param operands request operand bytes
+    # @param sessionId session id of a multiplexed request (None without mux)
+    # @return reply bytes
+    def executeBinary(self, opcode, operands, sessionId):
+        if opcode == BinaryProtocol.SYNC:
+            count = self.unacknowledged
+            self.unacknowledged = 0
+            return BinaryProtocol.encodeCount(count)
+
+        if opcode == BinaryProtocol.STATS:
+            return BinaryProtocol.encodeText(ServerSession.statsJson())
+
+        if opcode == BinaryProtocol.PING:
+            return BinaryProtocol.ACK
+
+        if opcode == BinaryProtocol.READY:
+            return BinaryProtocol.TRUE if ServerSession.ready else BinaryProtocol.FALSE
+
+        return self.runCommand(sessionId, BinaryProtocol.COMMAND_NAMES[opcode],
+            lambda player: BinaryProtocol.execute(player, opcode, operands), lambda message: BinaryProtocol.ERROR)
@@ -0,0 +1,284 @@
+# -------------------------------------------------------------------------------
+#  SharedMemoryTransport
+#  Carries the player protocol between two processes on the same host through
+#  shared memory instead of a socket, so passing a message involves no system
+#  call (an idle poller may still yield or sleep).
+#
+#  A channel is one shared memory segment holding a control block and two
+#  single-producer/single-consumer byte rings, one for requests (client ->
+#  server) and one for replies (server -> client):
+#
+#    [control: generation u64 | pad][request ring][reply ring]
+#    ring = [head u64 | tail u64 | pad][capacity data bytes]
+#
+#  The producer only ever writes head and the consumer only ever writes tail,
+#  so neither side needs a lock.  A client bumps the generation when it attaches,
+#  which tells the server to start a fresh session for it.  Both sides poll; an
+#  idle poller spins briefly (not at all on a single CPU, where spinning only
+#  delays the other side), then yields the CPU, then backs off to short sleeps.
+#
+#  The server creates numSlots channels named <name>-0 ... <name>-<numSlots-1>;
+#  each client attaches to its own slot.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import os
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+class ShmRing:
+
+    # Bytes reserved for head and tail at the start of a ring.
+    HEADER_BYTES = 64
+
+    # @param buf memoryview of the ring (header followed by the data bytes)
+    def __init__(self, buf):
+        self.buf = buf
+        self.capacity = len(buf) - ShmRing.HEADER_BYTES
+
+    def _head(self):
+        return struct.unpack_from("<Q", self.buf, 0)[0]
+
+    def _tail(self):
+        return struct.unpack_from("<Q", self.buf, 8)[0]
+
+    # Reset the ring to empty.  Only safe while neither side is using it.
+    def reset(self):
+        struct.pack_into("<QQ", self.buf, 0, 0, 0)
+
+    # Copy as much of data into the ring as currently fits.
+    # @param data bytes to write
+    # @return number of bytes written
+    def write(self, data):
+        head = self._head()
+        count = min(len(data), self.capacity - (head - self._tail()))
+        if count <= 0:
+            return 0
+        start = head % self.capacity
+        first = min(count, self.capacity - start)
+        base = ShmRing.HEADER_BYTES
+        self.buf[base + start:base + start + first] = data[:first]
+        if count > first:
+            self.buf[base:base + count - first] = data[first:count]
+        # Publish the data only once it has been copied.
+        struct.pack_into("<Q", self.buf, 0, head + count)
+        return count
+
+    # Take every byte currently in the ring.
+    # @return bytes read (possibly empty)
+    def read(self):
+        head = self._head()
+        tail = self._tail()
+        count = head - tail
+        if count == 0:
+            return b""
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        base = ShmRing.HEADER_BYTES
+        data = bytes(self.buf[base + start:base + start + first])
+        if count > first:
+            data += bytes(self.buf[base:base + count - first])
+        struct.pack_into("<Q", self.buf, 8, tail + count)
+        return data
+
+class ShmChannel:
+
+    # Bytes reserved for the control block.
+    CONTROL_BYTES = 64
+
+    # Default data capacity of each ring.
+    RING_CAPACITY = 1 << 16
+
+    # Polls an idle poller spends spinning, then yielding the CPU, before it starts sleeping.
+    SPIN_POLLS = 2000 if (os.cpu_count() or 1) > 1 else 0
+    YIELD_POLLS = 2000
+    IDLE_SLEEP = 0.00005
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        buf = shm.buf
+        ringBytes = (len(buf) - ShmChannel.CONTROL_BYTES) // 2
+        self.control = buf[:ShmChannel.CONTROL_BYTES]
+        self.requests = ShmRing(buf[ShmChannel.CONTROL_BYTES:ShmChannel.CONTROL_BYTES + ringBytes])
+        self.replies = ShmRing(buf[ShmChannel.CONTROL_BYTES + ringBytes:ShmChannel.CONTROL_BYTES + 2 * ringBytes])
+
+    # Create a new channel (server side).
+    # @param name shared memory segment name
+    # @param capacity data capacity of each ring
+    # @return the new ShmChannel
+    def create(name, capacity=RING_CAPACITY):
+        size = ShmChannel.CONTROL_BYTES + 2 * (ShmRing.HEADER_BYTES + capacity)
+        try:
+            # Remove a segment left behind by a server that did not shut down cleanly.
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        return ShmChannel(shm, True)
+
+    # Attach to a channel created by a server (client side) and start a new session on it.
+    # @param name shared memory segment name
+    # @return the attached ShmChannel
+    def attach(name):
+        shm = shared_memory.SharedMemory(name=name)
+        # The server owns the segment; keep this process from unlinking it on exit.
+        resource_tracker.unregister(shm._name, "shared_memory")
+        channel = ShmChannel(shm, False)
+        channel.requests.reset()
+        channel.replies.reset()
+        struct.pack_into("<Q", channel.control, 0, channel.generation() + 1)
+        return channel
+
+    # Return the generation, bumped each time a client attaches.
+    # @return generation number
+    def generation(self):
+        return struct.unpack_from("<Q", self.control, 0)[0]
+
+    # Back off after a number of consecutive idle polls.
+    # @param polls consecutive idle polls so far
+    def idle(polls):
+        if polls < ShmChannel.SPIN_POLLS:
+            return
+        if polls < ShmChannel.SPIN_POLLS + ShmChannel.YIELD_POLLS:
+            os.sched_yield()
+        else:
+            time.sleep(ShmChannel.IDLE_SLEEP)
+
+    # Write all of data to a ring, waiting for space as needed.
+    # @param ring ring to write to
+    # @param data bytes to write
+    def writeAll(ring, data):
+        view = memoryview(data)
+        polls = 0
+        while len(view) > 0:
+            count = ring.write(view)
+            view = view[count:]
+            if count == 0:
+                ShmChannel.idle(polls)
+                polls += 1
+
+    # Send request bytes to the server (client side).
+    # @param data request bytes
+    def send(self, data):
+        ShmChannel.writeAll(self.requests, data)
+
+    # Wait for reply bytes from the server (client side).
+    # @param timeout seconds to wait before giving up (None to wait forever)
+    # @return reply bytes (empty on timeout)
+    def receive(self, timeout=None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        polls = 0
+        while True:
+            data = self.replies.read()
+            if data:
+                return data
+            if deadline is not None and time.perf_counter() > deadline:
+                return b""
+            ShmChannel.idle(polls)
+            polls += 1
+
+    # Release the segment, unlinking it if this side created it.
+    def close(self):
+        self.control.release()
+        self.requests.buf.release()
+        self.replies.buf.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+# Serve sessions on numSlots shared memory channels until stop() returns True.
+# Replies are written without blocking: a slot whose reply ring is full keeps the
+# rest pending and reads no further requests meanwhile, and its session is
+# dropped if the client reads none of it for replyTimeout seconds, so one slot
+# never stalls the others.  A session whose feed fails is dropped alone as well.
+# @param name base name of the channels
+# @param numSlots number of channels (concurrent clients)
+# @param sessionFactory function returning a new session with feed(bytes) -> bytes and close()
+# @param stop function polled to end serving (never stops if None)
+# @param replyTimeout seconds a client may leave its full reply ring unread
+def serveSharedMemory(name, numSlots, sessionFactory, stop=None, replyTimeout=5.0):
+    channels = [ShmChannel.create("%s-%d" % (name, i)) for i in range(numSlots)]
+    generations = [0] * numSlots
+    sessions = [None] * numSlots
+    # Per slot: reply bytes not written yet, and since when no byte of them could be written.
+    pending = [b""] * numSlots
+    stalledSince = [None] * numSlots
+    idlePolls = 0
+
+    def drop(i, reason):
+        print('Dropping shared memory session %s-%d: %s' % (name, i, reason))
+        sessions[i].close()
+        sessions[i] = None
+        pending[i] = b""
+        stalledSince[i] = None
+
+    try:
+        while stop is None or not stop():
+            busy = False
+            for i, channel in enumerate(channels):
+                generation = channel.generation()
+                if generation != generations[i]:
+                    generations[i] = generation
+                    if sessions[i] is not None:
+                        sessions[i].close()
+                    sessions[i] = sessionFactory()
+                    pending[i] = b""
+                    stalledSince[i] = None
+                if sessions[i] is None:
+                    continue
+                if not pending[i]:
+                    data = channel.requests.read()
+                    if not data:
+                        continue
+                    busy = True
+                    try:
+                        pending[i] = sessions[i].feed(data)
+                    except Exception as e:
+                        drop(i, "%s: %s" % (type(e).__name__, e))
+                        continue
+                    if not pending[i]:
+                        continue
+                count = channel.replies.write(pending[i])
+                pending[i] = pending[i][count:]
+                if count > 0 or not pending[i]:
+                    busy = True
+                    stalledSince[i] = None
+                elif stalledSince[i] is None:
+                    stalledSince[i] = time.monotonic()
+                elif time.monotonic() - stalledSince[i] > replyTimeout:
+                    drop(i, "client read no reply for %.1f s" % replyTimeout)
+            if busy:
+                idlePolls = 0
+            else:
+                ShmChannel.idle(idlePolls)
+                idlePolls += 1
+    finally:
+        for session in sessions:
+            if session is not None:
+                session.close()
+        for channel in channels:
+            channel.close()
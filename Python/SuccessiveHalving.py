@@ -0,0 +1,123 @@
+# -------------------------------------------------------------------------------
+#  SuccessiveHalving
+#  Adaptive search over OpponentHandEstimationPlayer parameters: every candidate
+#  setting starts with a few deals, and after each round only the best
+#  1/eta of the survivors go on, with eta times the deals.  Games are
+#  concentrated on the contenders instead of being spent evenly on settings
+#  that are clearly worse.
+#
+#  Candidates are the grid points of ParameterSweep (same --param syntax) over
+#  the PlayerParameters (alpha, probExponent, ownCardBonus, ...).
+#  Every round plays common seeded deals in both seat orders on the
+#  ParameterSweep worker pool, and a survivor only plays the deals it has not
+#  played yet, so the deals of earlier rounds are reused.  Survivors are ranked by their mean win
+#  rate per deal over the deals they all played.
+#
+#    $ python3 SuccessiveHalving.py --param mixingRounds=0 --param alpha=0.05:0.65:7 \
+#          --param probExponent=2,4,6 --min-deals 10 --out halving.jobs.csv
+#
+#  The report ends with the games played and those a full grid would have
+#  played to give every candidate as many deals as the winner.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from ParameterSweep import ParameterSweep
+
+# Return a grid point as text.
+# @param point list of (name, value) pairs
+# @return e.g. "alpha=0.15, probExponent=4"
+def describe(point):
+    return ", ".join("%s=%.4g" % (name, value) for name, value in point)
+
+# Run successive halving.
+# @param candidates grid points to search
+# @param minDeals deals of the first round
+# @param eta factor by which survivors shrink and deals grow each round
+# @param dealsPerJob deals per worker job
+# @param outPath CSV of finished jobs, appended to and used to resume (None for none)
+# @param processes number of worker processes
+# @param seed base seed of the deals
+# @return (list of rounds, each a list of (point, deals, mean score) best first, finished jobs);
+#         the best of the last round is the winner
+def successiveHalving(candidates, minDeals, eta, dealsPerJob, outPath, processes, seed=0):
+    header = ParameterSweep.header(candidates, True, seed, dealsPerJob)
+    finished = ParameterSweep.readFinished(outPath, header) if outPath is not None else {}
+
+    rounds = []
+    survivors = list(candidates)
+    deals = minDeals
+    with ParameterSweep.startPool(processes) as executor:
+        while True:
+            # Whole jobs only, so that the jobs of this round are reused by the next.
+            deals = -(-deals // dealsPerJob) * dealsPerJob
+            jobs = []
+            for point in survivors:
+                jobs += ParameterSweep.jobsFor(point, deals, dealsPerJob, seed, True, finished)
+            startTime = time.time()
+            ParameterSweep.runJobs(executor, jobs, finished, outPath, header)
+
+            scores = [ParameterSweep.outcomes(point, finished)[:deals].mean() / 2 for point in survivors]
+            ranking = sorted(zip(survivors, scores), key=lambda entry: -entry[1])
+            rounds.append([(point, deals, score) for point, score in ranking])
+            print("Round %d: %d candidates, %d deals each, %d jobs played in %.1f s, best %s (%.4f)" % (len(rounds),
+                len(survivors), deals, len(jobs), time.time() - startTime, describe(ranking[0][0]), ranking[0][1]))
+
+            survivors = [point for point, _ in ranking[:len(survivors) // eta]]
+            if len(survivors) <= 1:
+                return rounds, finished
+            deals *= eta
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Successive halving search over OpponentHandEstimationPlayer parameters.')
+    parser.add_argument('--param', action='append', required=True, help='name=low:high:count or name=v1,v2,... (repeatable)')
+    parser.add_argument('--min-deals', type=int, default=10, help='deals (two games each) per candidate in the first round')
+    parser.add_argument('--eta', type=int, default=2, help='keep the best 1/eta of the candidates and play eta times the deals each round')
+    parser.add_argument('--chunk', type=int, default=5, help='deals per job')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='CSV of finished jobs, appended to and used to resume')
+    args = parser.parse_args()
+
+    try:
+        candidates = ParameterSweep.parseGrid(args.param)
+    except ValueError as e:
+        parser.error(str(e))
+    startTime = time.time()
+    rounds, finished = successiveHalving(candidates, args.min_deals, args.eta, args.chunk, args.out, args.processes, args.seed)
+    print("Finished in %.1f s" % (time.time() - startTime))
+
+    best, bestDeals, bestScore = rounds[-1][0]
+    score = ParameterSweep.outcomes(best, finished)[:bestDeals] / 2
+    print("Best: %s, win rate %.4f +- %.4f over %d games" % (describe(best), bestScore,
+        score.std(ddof=1) / np.sqrt(len(score)) if len(score) > 1 else float("nan"), 2 * bestDeals))
+
+    # Games of the deals each candidate reached, against every candidate playing the deals of the winner.
+    played = sum(2 * len(ParameterSweep.outcomes(point, finished)) for point in candidates)
+    fullGrid = 2 * bestDeals * len(candidates)
+    print("%d games played, %d for a full grid with %d deals per candidate: %.1f%% saved" % (played, fullGrid,
+        bestDeals, 100 * (1 - played / fullGrid)))
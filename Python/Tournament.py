@@ -0,0 +1,171 @@
+# -------------------------------------------------------------------------------
+#  Tournament
+#  Rates many agents against each other without a full round robin.
+#
+#  Play proceeds in rounds.  Each round BradleyTerry picks the pairings whose
+#  games would narrow the rating intervals most (close pairings with an
+#  uncertain difference, spread over the batch), the matches run on the
+#  ParameterSweep worker pool, and every finished match updates the ratings at
+#  once.  A match plays seeded deals in both seat orders, so neither agent
+#  profits from the seat or the deal; every pairing continues with new deals.
+#
+#    $ python3 Tournament.py --games 4000 --processes 8
+#
+#  Agents are named in AGENTS: the OldAgents variants are expressed as
+#  PlayerParameters sets of OpponentHandEstimationPlayer, sharing one model.
+#  Agents that cannot be created here (e.g. nfsp without nfsp4.npz) are left out
+#  with a note.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import argparse
+import functools
+import os
+import time
+from concurrent.futures import as_completed
+
+from BradleyTerry import BradleyTerry
+from GinRummyGame import GinRummyGame
+from NumpyNFSPPlayer import NumpyNFSPPlayer
+from OpponentHandEstimationPlayer import OpponentHandEstimationPlayer
+from ParameterSweep import ParameterSweep
+from PlayerParameters import PlayerParameters
+from ResultsStore import ResultsStore
+from SimpleGinRummyPlayer import SimpleGinRummyPlayer
+
+class Tournament:
+
+    # Map from agent name to a function creating the agent.
+    AGENTS = {
+        "simple": SimpleGinRummyPlayer,
+        "ohe": OpponentHandEstimationPlayer,
+        "nfsp": NumpyNFSPPlayer,
+    }
+    for variant, params in PlayerParameters.VARIANTS.items():
+        if variant != "default":
+            AGENTS[variant] = functools.partial(OpponentHandEstimationPlayer, params=params)
+    del variant, params
+
+    # Players and games of this process, created on first use.
+    players = {}
+    games = {}
+
+    # Return the player of an agent in this process.
+    # @param name agent name
+    # @return player
+    def player(name):
+        if name not in Tournament.players:
+            Tournament.players[name] = Tournament.AGENTS[name]()
+        return Tournament.players[name]
+
+    # Play a match on seeded deals, each in both seat orders (in a worker process).
+    # @param nameA name of one agent
+    # @param nameB name of the other agent
+    # @param first index of the first deal of this pairing to play
+    # @param count deals to play
+    # @param seed base seed
+    # @return (nameA, nameB, games won by A, games played, seconds)
+    def playMatch(nameA, nameB, first, count, seed):
+        if (nameA, nameB) not in Tournament.games:
+            playerA = Tournament.player(nameA)
+            playerB = Tournament.player(nameB)
+            Tournament.games[nameA, nameB] = (GinRummyGame(playerA, playerB), GinRummyGame(playerB, playerA))
+        game, swappedGame = Tournament.games[nameA, nameB]
+
+        startTime = time.perf_counter()
+        winsA = 0
+        for deal in range(first, first + count):
+            dealSeed = "%d %s %s %d" % (seed, nameA, nameB, deal)
+            winsA += 1 - ParameterSweep.playGame(game, (nameA, nameB), None, dealSeed)
+            winsA += ParameterSweep.playGame(swappedGame, (nameB, nameA), None, dealSeed)
+        return nameA, nameB, winsA, 2 * count, time.perf_counter() - startTime
+
+    # Return the agents that can be created here, printing why the others cannot.
+    # @param names agent names
+    # @return the names of the agents that were created
+    def available(names):
+        created = []
+        for name in names:
+            if name not in Tournament.AGENTS:
+                raise ValueError("unknown agent %s (known: %s)" % (name, ", ".join(Tournament.AGENTS)))
+            try:
+                Tournament.player(name)
+                created.append(name)
+            except OSError as e:
+                print("Leaving out %s: %s" % (name, e))
+        return created
+
+    # Run rounds of the most informative matches until the game budget is spent.
+    # @param names agent names
+    # @param numGames games to play in total
+    # @param dealsPerMatch deals per match (two games each)
+    # @param matchesPerRound matches per round
+    # @param processes number of worker processes
+    # @param seed base seed
+    # @return BradleyTerry ratings
+    def run(names, numGames, dealsPerMatch, matchesPerRound, processes, seed=0):
+        ratings = BradleyTerry(names)
+        nextDeal = {}
+        played = 0
+        # The agents were created by available, so the forked workers share their models.
+        with ParameterSweep.startPool(processes) as executor:
+            while played < numGames:
+                numMatches = min(matchesPerRound, -(-(numGames - played) // (2 * dealsPerMatch)))
+                futures = []
+                for i, j in ratings.nextPairings(numMatches, 2 * dealsPerMatch):
+                    first = nextDeal.get((i, j), 0)
+                    nextDeal[i, j] = first + dealsPerMatch
+                    futures.append(executor.submit(Tournament.playMatch, names[i], names[j], first, dealsPerMatch, seed))
+                for future in as_completed(futures):
+                    nameA, nameB, winsA, games, _ = future.result()
+                    ratings.record(names.index(nameA), names.index(nameB), winsA, games)
+                    played += games
+                best = max(range(len(names)), key=lambda i: ratings.theta[i])
+                print("%d games played, leader %s" % (played, names[best]))
+        return ratings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rate agents with adaptively paired matches.')
+    parser.add_argument('--agent', action='append', default=None, help='agent to rate (repeatable; all agents if not given)')
+    parser.add_argument('--games', type=int, default=2000, help='games to play in total')
+    parser.add_argument('--deals', type=int, default=10, help='deals per match, each played in both seat orders')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--matches-per-round', type=int, default=None, help='matches between rating updates (twice the processes by default)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', default=None, help='SQLite results store to record every game in (see ResultsStore)')
+    args = parser.parse_args()
+
+    names = Tournament.available(args.agent if args.agent is not None else list(Tournament.AGENTS))
+    if len(names) < 2:
+        raise SystemExit('Need at least two agents')
+    if args.db is not None:
+        ResultsStore.start(args.db, "tournament", vars(args))
+    startTime = time.time()
+    try:
+        ratings = Tournament.run(names, args.games, args.deals, args.matches_per_round or 2 * args.processes, args.processes, args.seed)
+    finally:
+        ResultsStore.stop()
+    print("Finished in %.1f s" % (time.time() - startTime))
+
+    print("%-10s %8s %8s %8s" % ("agent", "elo", "95% +-", "games"))
+    for name, (elo, halfWidth, games) in sorted(zip(names, ratings.ratings()), key=lambda entry: -entry[1][0]):
+        print("%-10s %+8.0f %8.0f %8d" % (name, elo, halfWidth, games))
@@ -0,0 +1,169 @@
+# -------------------------------------------------------------------------------
+#  TransportBenchmark
+#  Compares the round trip latency of the Server.py transports (TCP, unix
+#  domain socket, shared memory) on this host.
+#
+#  For each transport a server is started in a subprocess, a client starts a
+#  game and then times a number of round trips of "sync" (pure protocol
+#  overhead) and of "willDrawFaceUpCard" (a cheap decision).  A second client
+#  does the same in the binary framing of BinaryProtocol ("hello binary"), so
+#  each transport gets rows for text and binary commands.
+#
+#    $ python3 TransportBenchmark.py --round-trips 5000
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from BinaryProtocol import BinaryProtocol
+from Deck import Deck
+from SharedMemoryTransport import ShmChannel
+
+START_GAME = b"startGame 0 0 AD AS AH AC 2C 3C 4C 4H 4D 4S\n"
+
+# Text and binary requests timed: (name, text line, binary request, binary reply length).
+HAND = [Deck.strCardMap[cardStr] for cardStr in "AD AS AH AC 2C 3C 4C 4H 4D 4S".split()]
+BINARY_START_GAME = bytes([BinaryProtocol.START_GAME, 0, 0, len(HAND)] + [card.getId() for card in HAND])
+REQUESTS = [
+    ("sync", b"sync\n", bytes([BinaryProtocol.SYNC]), 4),
+    ("willDrawFaceUpCard", b"willDrawFaceUpCard 4H\n", bytes([BinaryProtocol.WILL_DRAW_FACE_UP_CARD, Deck.strCardMap["4H"].getId()]), 1),
+]
+
+# Client end of a socket transport.
+class SocketClient:
+
+    def __init__(self, sock):
+        self.sock = sock
+        if sock.family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def receive(self):
+        return self.sock.recv(4096)
+
+    def close(self):
+        self.sock.close()
+
+# Client end of a shared memory transport.
+class ShmClient:
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def send(self, data):
+        self.channel.send(data)
+
+    def receive(self):
+        return self.channel.receive()
+
+    def close(self):
+        self.channel.close()
+
+# Connect to a server started with the given transport, retrying until it is up.
+# @param transport tcp, unix or shm
+# @param args parsed command line arguments
+# @param slot shared memory slot to attach to (shm only)
+# @return connected client
+def connect(transport, args, slot=0):
+    deadline = time.time() + args.startup_timeout
+    while True:
+        try:
+            if transport == 'tcp':
+                return SocketClient(socket.create_connection(('localhost', args.port)))
+            if transport == 'unix':
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(args.unix_path)
+                return SocketClient(sock)
+            return ShmClient(ShmChannel.attach("%s-%d" % (args.shm_name, slot)))
+        except (OSError, FileNotFoundError):
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+# Send one request and wait for its full reply.
+# @param client connected client
+# @param request command line including its newline, or binary request
+# @param replyLength length of a binary reply (None for a single-line text reply)
+def roundTrip(client, request, replyLength=None):
+    client.send(request)
+    reply = client.receive()
+    while not (reply.endswith(b"\n") if replyLength is None else len(reply) >= replyLength):
+        reply += client.receive()
+
+# Time round trips of a request.
+# @param client connected client
+# @param request command line including its newline, or binary request
+# @param count number of round trips
+# @param replyLength length of a binary reply (None for a single-line text reply)
+# @return latencies in microseconds
+def timeRoundTrips(client, request, count, replyLength=None):
+    latencies = np.zeros(count)
+    for i in range(count):
+        startTime = time.perf_counter()
+        roundTrip(client, request, replyLength)
+        latencies[i] = (time.perf_counter() - startTime) * 1e6
+    return latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare Server.py transport latency.')
+    parser.add_argument('--transports', nargs='+', default=['tcp', 'unix', 'shm'])
+    parser.add_argument('--round-trips', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=41870)
+    parser.add_argument('--unix-path', default='/tmp/ginrummy-benchmark.sock')
+    parser.add_argument('--shm-name', default='ginrummy-benchmark')
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    print("%-6s %-7s %-20s %10s %10s %10s" % ("", "framing", "command", "p50 us", "p99 us", "mean us"))
+    for transport in args.transports:
+        server = subprocess.Popen([sys.executable, "Server.py", "--transport", transport, "--port", str(args.port),
+            "--unix-path", args.unix_path, "--shm-name", args.shm_name, "--shm-slots", "2"],
+            stdout=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            for slot, framing in enumerate(["text", "binary"]):
+                client = connect(transport, args, slot)
+                binary = framing == "binary"
+                roundTrip(client, b"hello binary\n" if binary else b"hello\n")
+                if binary:
+                    roundTrip(client, BINARY_START_GAME, 1)
+                else:
+                    roundTrip(client, START_GAME)
+                for name, line, request, replyLength in REQUESTS:
+                    if not binary:
+                        request, replyLength = line, None
+                    timeRoundTrips(client, request, min(200, args.round_trips), replyLength) # warm up
+                    latencies = timeRoundTrips(client, request, args.round_trips, replyLength)
+                    print("%-6s %-7s %-20s %10.1f %10.1f %10.1f" % (transport, framing, name,
+                        np.percentile(latencies, 50), np.percentile(latencies, 99), latencies.mean()))
+                client.close()
+        finally:
+            server.terminate()
+            server.wait()
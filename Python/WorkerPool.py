@@ -0,0 +1,249 @@
+# -------------------------------------------------------------------------------
+#  WorkerPool
+#  Pre-forked worker processes that run the ServerSessions of Server.py, so the
+#  CPU-bound decisions of many concurrent matches use several cores.
+#
+#  Create the pool after loading the model (ModelRegistry.preload) and before
+#  starting the asyncio event loop: the workers are forked and inherit the
+#  loaded model copy-on-write.  The server then forwards the bytes it reads from
+#  a connection to the worker owning that connection and writes back the reply.
+#  A connection sticks to one worker for its whole life; a new connection goes
+#  to the worker with the fewest open connections.
+#
+#  All games multiplexed over one connection (see ServerSession) therefore share
+#  a worker and one core: a server with N workers uses at most as many cores as
+#  it has connections.  Clients multiplexing many games should open at least N
+#  connections and spread their games over them.
+#
+#  A worker that exits is replaced by a new one forked from the server, which
+#  still holds the loaded model; the connections it served are dropped.
+#
+#  @author Anthony Hein
+#  @version 1.0
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+# Copyright (C) 2020 Anthony Hein
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# Information about the GNU General Public License is available online at:
+#   http://www.gnu.org/licenses/
+# To receive a copy of the GNU General Public License, write to the Free
+# Software Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA
+# 02111-1307, USA.
+# -------------------------------------------------------------------------------
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import stat
+from collections import deque
+
+from ModelRegistry import ModelRegistry
+from ServerMetrics import ServerMetrics
+from ServerSession import ServerSession
+
+# Point every socket this process inherited, except keep, at /dev/null.  A worker
+# restarted by a running server inherits its listening socket and client
+# connections, which would otherwise stay open until the worker exits.  The
+# descriptors stay taken, so closing their stale socket objects harms nothing.
+# @param keep descriptor to leave alone (the pipe to the server)
+def _releaseSockets(keep):
+    try:
+        fds = [int(fd) for fd in os.listdir("/proc/self/fd")]
+    except OSError:
+        return
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in fds:
+        if fd in (keep, devnull):
+            continue
+        try:
+            if stat.S_ISSOCK(os.fstat(fd).st_mode):
+                os.dup2(devnull, fd)
+        except OSError:
+            pass
+    os.close(devnull)
+
+# Main loop of a worker process: feed each (key, data) message to the session
+# of that key and send back (key, reply), or (key, exception) if it failed.
+# data None closes the session and gets no reply.  Returns once the server
+# closes the pipe or exits.
+# @param conn worker end of the pipe to the server
+# @param inherited server ends of the pipes to this and earlier workers
+# @param worker index of this worker
+# @param metricsFile file to dump this worker's metrics to (None for no dumps)
+# @param metricsInterval seconds between metrics dumps
+def _workerMain(conn, inherited, worker, metricsFile, metricsInterval):
+    # A worker restarted by a running server must not wake the server's event loop with its signals.
+    signal.set_wakeup_fd(-1)
+    # Ctrl-C is handled by the server, which then shuts the workers down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Holding these open would keep the earlier workers from seeing the server exit.
+    for other in inherited:
+        other.close()
+    _releaseSockets(conn.fileno())
+    # SIGHUP reloads the model (see ModelRegistry.reload).
+    signal.signal(signal.SIGHUP, lambda signum, frame: ModelRegistry.reloadInBackground())
+    ServerMetrics.reset()
+    ServerMetrics.worker = worker
+    if metricsFile is not None:
+        ServerMetrics.startDump(metricsFile, metricsInterval)
+    sessions = {}
+    while True:
+        try:
+            key, data = conn.recv()
+        except EOFError:
+            return
+        if data is None:
+            session = sessions.pop(key, None)
+            if session is not None:
+                session.close()
+            continue
+        session = sessions.get(key)
+        if session is None:
+            session = sessions[key] = ServerSession()
+        try:
+            conn.send((key, session.feed(data)))
+        except Exception as e:
+            sessions.pop(key).close()
+            conn.send((key, ValueError(str(e))))
+
+class WorkerPool:
+
+    # Fork the worker processes.  Call before the event loop starts.
+    # @param numWorkers number of worker processes
+    # @param metricsFile base name of the files the workers dump their metrics to,
+    #        <metricsFile>.<worker> (None for no dumps)
+    # @param metricsInterval seconds between metrics dumps
+    def __init__(self, numWorkers, metricsFile=None, metricsInterval=10.0):
+        self.metricsFile = metricsFile
+        self.metricsInterval = metricsInterval
+        self.conns = [None] * numWorkers
+        self.processes = [None] * numWorkers
+        for worker in range(numWorkers):
+            self._spawn(worker)
+
+        # Per worker: futures waiting for replies, in request order, and open connections.
+        self.pending = [deque() for _ in range(numWorkers)]
+        self.load = [0] * numWorkers
+
+        # Map from connection key to the worker owning it (None once that worker exited).
+        self.assignment = {}
+        self.nextKey = 0
+        self.loop = None
+
+    # Fork a worker process.
+    # @param worker worker index
+    def _spawn(self, worker):
+        context = multiprocessing.get_context("fork")
+        serverConn, workerConn = context.Pipe()
+        inherited = [conn for conn in self.conns if conn is not None] + [serverConn]
+        process = context.Process(target=_workerMain, args=(workerConn, inherited, worker,
+            None if self.metricsFile is None else "%s.%d" % (self.metricsFile, worker), self.metricsInterval), daemon=True)
+        process.start()
+        workerConn.close()
+        self.conns[worker] = serverConn
+        self.processes[worker] = process
+
+    # Replace a worker that exited, dropping the connections it served.
+    # @param worker worker index
+    def _restart(self, worker):
+        conn = self.conns[worker]
+        if self.loop is not None:
+            self.loop.remove_reader(conn.fileno())
+        conn.close()
+        self.processes[worker].join(timeout=1)
+        while self.pending[worker]:
+            self.pending[worker].popleft().set_exception(ConnectionError("worker %d exited" % worker))
+        for key, owner in self.assignment.items():
+            if owner == worker:
+                self.assignment[key] = None
+        self.load[worker] = 0
+        print('Worker %d exited with code %s; starting a new one' % (worker, self.processes[worker].exitcode))
+        self._spawn(worker)
+        if self.loop is not None:
+            self.loop.add_reader(self.conns[worker].fileno(), self._onReadable, worker)
+
+    def _onReadable(self, worker):
+        conn = self.conns[worker]
+        while conn.poll():
+            try:
+                _, res = conn.recv()
+            except EOFError:
+                self._restart(worker)
+                return
+            future = self.pending[worker].popleft()
+            if isinstance(res, Exception):
+                future.set_exception(res)
+            else:
+                future.set_result(res)
+
+    def _start(self):
+        self.loop = asyncio.get_running_loop()
+        for worker, conn in enumerate(self.conns):
+            self.loop.add_reader(conn.fileno(), self._onReadable, worker)
+
+    # Assign a new connection to the least loaded worker.
+    # @return key identifying the connection in feed and close
+    def open(self):
+        if self.loop is None:
+            self._start()
+        for worker, process in enumerate(self.processes):
+            if not process.is_alive():
+                self._restart(worker)
+        key = self.nextKey
+        self.nextKey += 1
+        worker = min(range(len(self.conns)), key=lambda i: self.load[i])
+        self.assignment[key] = worker
+        self.load[worker] += 1
+        return key
+
+    # Feed bytes read from a connection to its session in the owning worker.
+    # @param key connection key returned by open
+    # @param data bytes read from the connection
+    # @return reply bytes (raises ValueError if the session rejected the data, and
+    #         ConnectionError if its worker exited)
+    async def feed(self, key, data):
+        worker = self.assignment[key]
+        if worker is None:
+            raise ConnectionError("the worker of this connection exited")
+        future = self.loop.create_future()
+        self.pending[worker].append(future)
+        self.conns[worker].send((key, data))
+        return await future
+
+    # Drop the session of a closed connection.
+    # @param key connection key returned by open
+    def close(self, key):
+        worker = self.assignment.pop(key, None)
+        if worker is None:
+            # Unknown, or its worker exited and was replaced.
+            return
+        self.load[worker] -= 1
+        try:
+            self.conns[worker].send((key, None))
+        except OSError:
+            pass
+
+    # Send a signal to every worker, e.g. SIGHUP to reload the model.
+    # @param signum signal number
+    def signalWorkers(self, signum):
+        for process in self.processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    # Stop all workers.
+    def shutdown(self):
+        for conn in self.conns:
+            conn.close()
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()